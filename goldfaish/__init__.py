@@ -6,3 +6,7 @@ from pathlib import Path
 #FORGE_BIN_PATH = r"C:\Users\Greg Izatt\src\forge\forge-installer\target\forge-installer-2.0.05-SNAPSHOT\forge.cmd"
 FORGE_BIN_DIR = r'C:\Users\Greg Izatt\src\forge\forge-installer\target\forge-installer-2.0.05-SNAPSHOT' "\\"
 FORGE_CMD = """java -Xmx4096m "-Dio.netty.tryReflectionSetAccessible=true" "-Dfile.encoding=UTF-8" -jar forge-gui-desktop-2.0.05-SNAPSHOT-jar-with-dependencies.jar"""
+# Both can be overridden from the environment, e.g. to run
+# `goldfaish/fake_forge.py` in place of Forge.
+FORGE_BIN_DIR = os.environ.get("GOLDFAISH_FORGE_BIN_DIR", FORGE_BIN_DIR)
+FORGE_CMD = os.environ.get("GOLDFAISH_FORGE_CMD", FORGE_CMD)
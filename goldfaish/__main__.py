@@ -0,0 +1,3 @@
+from goldfaish.cli import main
+
+main()
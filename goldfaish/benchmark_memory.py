@@ -0,0 +1,160 @@
+'''
+    Compares the memory held by parsed games in the compact `game_model` form
+    against the nested dicts `parse_game_log_file` returned before it. The
+    "before" figure comes from `parse_game_log_file_as_dicts`, a copy of that
+    parser, so both sides allocate their strings and records the way they
+    would in the pipeline.
+
+        python -m goldfaish.benchmark_memory <experiment dir> --games 200
+'''
+import os
+import gc
+import re
+import glob
+import time
+import argparse
+import tracemalloc
+from collections import defaultdict
+
+from goldfaish.game_model import ZONES
+from goldfaish.process_logs import (EVENT_HEADER, GAME_OUTCOME_EVENT,
+                                    TURN_PHASE_EVENT, is_kept_turn_phase,
+                                    parse_card_list, parse_game_log_file)
+
+
+def parse_game_state_as_dict(data: str, player_names_in_order) -> dict:
+    # As `process_logs.parse_game_state` was before `game_model`: every zone
+    # is parsed card by card, even the ones only counted for their size.
+    out = {}
+    data_as_dict = {}
+    for row in data.split("\n"):
+        if "=" not in row:
+            continue
+        field_name, field_data = row.split("=", 1)
+        data_as_dict[field_name] = field_data
+
+    out["turn"] = int(data_as_dict["turn"])
+    out["activeplayer"] = player_names_in_order[int(
+        data_as_dict["activeplayer"][1])]
+    out["activephase"] = data_as_dict["activephase"]
+    for k, player_name in enumerate(player_names_in_order):
+        basename = f"p{k}"
+        player_state = {"life": data_as_dict[f"{basename}life"]}
+        for field_name in ["battlefield", "hand"]:
+            player_state[field_name] = parse_card_list(
+                data_as_dict[f"{basename}{field_name}"])
+        player_state["field_sizes"] = {
+            field_name:
+            len(parse_card_list(data_as_dict[f"{basename}{field_name}"]))
+            for field_name in ZONES
+        }
+        out[player_name] = player_state
+    return out
+
+
+def parse_game_log_file_as_dicts(log_file) -> dict:
+    '''
+        The nested-dict parser `parse_game_log_file` replaced, without its
+        error reporting.
+    '''
+    assert log_file.readline().strip() == "=== Players ==="
+    player_names = [
+        log_file.readline().split(" - ")[0],
+        log_file.readline().split(" - ")[0]
+    ]
+    out = {
+        "turns": defaultdict(dict),
+        "players": player_names,
+        "winner": "NONE",
+    }
+
+    def handle_event_block(event: str, data: str):
+        if event == TURN_PHASE_EVENT and is_kept_turn_phase(data):
+            game_state = parse_game_state_as_dict(data, player_names)
+            out["turns"][game_state["turn"]][
+                game_state["activephase"]] = game_state
+        elif event == GAME_OUTCOME_EVENT:
+            winners = re.findall(r"(.+) has won", data[7:])
+            if len(winners) == 1:
+                out["winner"] = winners[0]
+            loss_reason = re.findall(r"has lost (.+)", data[7:])
+            if len(loss_reason) == 1:
+                out["loss_reason"] = loss_reason[0]
+
+    current_event = None
+    current_block = []
+    for line in log_file:
+        line = line.rstrip('\n')
+        match = EVENT_HEADER.match(line)
+        if match:
+            if current_event:
+                handle_event_block(current_event, "\n".join(current_block))
+            current_event = match.group(1)
+            current_block = []
+        elif current_event:
+            current_block.append(line)
+    if current_event:
+        handle_event_block(current_event, "\n".join(current_block))
+    return out
+
+
+def measure(build):
+    '''
+        Returns (result, bytes still allocated by build(), seconds taken).
+    '''
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, allocated, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure memory used by parsed games.")
+    parser.add_argument("experiment_dir", help="Experiment directory.")
+    parser.add_argument("--games",
+                        type=int,
+                        default=100,
+                        help="Number of game logs to parse")
+    args = parser.parse_args(argv)
+
+    logs_dir = os.path.join(args.experiment_dir, "logs")
+    log_paths = [
+        os.path.join(logs_dir, log_subpath)
+        for log_subpath in sorted(glob.glob("**/*.log", root_dir=logs_dir))
+    ][:args.games]
+    assert log_paths, f"No logs found in {logs_dir}"
+
+    def parse_all(parse):
+        games = []
+        for log_path in log_paths:
+            with open(log_path, "r") as f:
+                games.append(parse(f))
+        return games
+
+    # The dicts are measured and freed first, so the compact games' string
+    # pools don't start out holding strings the dicts already paid for.
+    dicts, dict_bytes, dict_seconds = measure(
+        lambda: parse_all(parse_game_log_file_as_dicts))
+    del dicts
+    games, compact_bytes, compact_seconds = measure(
+        lambda: parse_all(parse_game_log_file))
+
+    num_cards = sum(len(game.cards) for game in games)
+    print(f"{len(games)} games, {num_cards} card rows")
+    print(f"  nested dicts: {dict_bytes / 2**20:10.1f} MiB "
+          f"({dict_bytes / len(games) / 2**10:0.1f} KiB/game), "
+          f"parsed in {dict_seconds:0.2f} s")
+    print(f"  compact:      {compact_bytes / 2**20:10.1f} MiB "
+          f"({compact_bytes / len(games) / 2**10:0.1f} KiB/game), "
+          f"parsed in {compact_seconds:0.2f} s")
+    print(f"  reduction:    {dict_bytes / max(compact_bytes, 1):10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
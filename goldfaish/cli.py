@@ -0,0 +1,60 @@
+'''
+    The `goldfaish` command: one entry point for every pipeline stage.
+
+        goldfaish collect <experiment dir> --games 20 --jobs 5
+        goldfaish process <experiment dir>
+        goldfaish plot <experiment dir>
+        goldfaish run <directory of experiments>
+
+    Each subcommand forwards its arguments to the `main` of the matching
+    module, which is only imported once that subcommand is chosen. Startup and
+    `--help` therefore never pay for matplotlib, scipy or numpy.
+'''
+import argparse
+import importlib
+import sys
+
+# Subcommand -> (module, help)
+COMMANDS = {
+    "collect": ("goldfaish.collect_data", "Simulate games with Forge."),
+    "process": ("goldfaish.process_logs",
+                "Parse game logs into data.json."),
+    "plot": ("goldfaish.plot_stats", "Render an experiment's index.html."),
+    "run": ("goldfaish.rerun_all_experiments",
+            "Collect, process and plot every experiment in a directory."),
+    "compare": ("goldfaish.compare_experiments",
+                "Render a report comparing several experiments."),
+    "query": ("goldfaish.query", "Find games matching a set of filters."),
+    "dashboard": ("goldfaish.live_dashboard",
+                  "Serve a live dashboard of an experiment's games."),
+    "load-test": ("goldfaish.load_test",
+                  "Load-test the pipeline with a fake Forge."),
+    "benchmark-memory": ("goldfaish.benchmark_memory",
+                         "Compare the memory of parsed games as dicts and "
+                         "in compact form."),
+}
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(
+        prog="goldfaish",
+        description="Simulate and analyze Forge matchups. Run "
+        "`goldfaish <command> --help` for a command's options.")
+    subparsers = parser.add_subparsers(dest="command",
+                                       metavar="command",
+                                       required=True)
+    for name, (_, help) in COMMANDS.items():
+        # The module's own parser handles everything after the command name,
+        # including --help.
+        subparsers.add_parser(name, help=help, add_help=False)
+    args = parser.parse_args(argv[:1])
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    sys.argv[0] = f"goldfaish {args.command}"
+    return module.main(argv[1:])
+
+
+if __name__ == "__main__":
+    main()
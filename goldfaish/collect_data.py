@@ -5,25 +5,64 @@ import uuid
 import subprocess
 import time
 import re
+import random
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from goldfaish import FORGE_BIN_DIR, FORGE_CMD
+from goldfaish.profiling import PROFILER
+from goldfaish.process_logs import pair_job_name, prune_game_log_file
+from goldfaish.startup_cache import (get_startup_jvm_flags, split_command,
+                                     with_jvm_flags)
+from goldfaish.telemetry import RunTelemetry
 import traceback
 import datetime
 
 TIMEOUT = 100000 # Just over a day...
+# Forge writes each game's log in one go once the game is over, so every log
+# in a job's directory is a finished game. One modified more recently than
+# this may still be being written out, so it isn't pruned yet.
+PRUNE_SETTLE_SECONDS = 2.
+
+
+def estimate_startup_time(start_time, log_times):
+    '''
+        Splits a job's wall time into JVM/Forge startup and time per game,
+        from when each game's log appeared. The first log shows up after
+        startup plus one game, so a typical game is taken off of it. Returns
+        (startup seconds, seconds per game), either None if unknown.
+    '''
+    if not log_times:
+        return None, None
+    if len(log_times) == 1:
+        return None, log_times[0] - start_time
+    per_game = (log_times[-1] - log_times[0]) / (len(log_times) - 1)
+    return max(log_times[0] - start_time - per_game, 0.), per_game
+
+
+def format_startup_report(job_name, start_time, log_times) -> str:
+    startup, per_game = estimate_startup_time(start_time, log_times)
+    if per_game is None:
+        return f"{job_name}: no games finished"
+    if startup is None:
+        return (f"{job_name}: 1 game in {per_game:0.1f}s (incl. startup)")
+    return (f"{job_name}: startup ~{startup:0.1f}s, {len(log_times)} games "
+            f"at {per_game:0.1f}s/game")
+
 
 def run_sim(out_dir: str,
             forge_args,
             quiet,
             games,
-            pbar=None):
-    
+            pbar=None,
+            prune_logs=False,
+            jvm_flags=(),
+            telemetry: RunTelemetry = None):
+
     raw_log_path = os.path.join(out_dir, f"raw_log.txt")
 
     # Build the forge command
     cmd = [
-        str(FORGE_CMD), "sim", "-n",
+        with_jvm_flags(str(FORGE_CMD), jvm_flags), "sim", "-n",
         str(games), "-logDir", '"' + out_dir + '"', *forge_args
     ]
     if quiet:
@@ -33,11 +72,22 @@ def run_sim(out_dir: str,
         try:
             cmd = " ".join(cmd)
             print("Launching job: ", cmd)
-            proc = subprocess.Popen(cmd,
+            proc = subprocess.Popen(split_command(cmd),
                                     stdout=logf,
                                     stderr=subprocess.STDOUT,
                                     cwd=FORGE_BIN_DIR)
             start_time = time.time()
+            if telemetry is not None:
+                job_telemetry = telemetry.start_job(os.path.basename(out_dir),
+                                                    games, proc.pid,
+                                                    start_time)
+            profile_start = time.perf_counter()
+            last_game_end = profile_start
+            # Game logs in the order they appeared.
+            log_order = []
+            log_times = []
+            pruned_logs = set()
+            pruned_bytes = [0, 0]
             process_done = False
             while not process_done:
                 time.sleep(1)
@@ -46,12 +96,71 @@ def run_sim(out_dir: str,
                 process_done = proc.returncode is not None
 
                 # Count number of files in this directory that end in `.log`.
+                game_logs = [f for f in os.listdir(out_dir) if f.endswith('.log')]
                 if pbar is not None:
-                    pbar.n = len([f for f in os.listdir(out_dir) if f.endswith('.log')])
+                    pbar.n = len(game_logs)
                     pbar.refresh()
 
+                new_logs = sorted(
+                    set(game_logs) - set(log_order),
+                    key=lambda f: os.path.getmtime(os.path.join(out_dir, f)))
+                if PROFILER.enabled:
+                    # Games are only observed at poll granularity, i.e. ~1s,
+                    # so when one poll finds several, each ends when its log
+                    # was written.
+                    now = time.perf_counter()
+                    wall_now = time.time()
+                    for i, game_log in enumerate(new_logs):
+                        written = now - (wall_now - os.path.getmtime(
+                            os.path.join(out_dir, game_log)))
+                        game_end = min(max(written, last_game_end), now)
+                        PROFILER.add_span(
+                            "first game (incl. JVM startup)"
+                            if not log_order and i == 0 else "game",
+                            last_game_end, game_end, cat="forge", log=game_log)
+                        last_game_end = game_end
+                log_order += new_logs
+                log_times += [time.time()] * len(new_logs)
+                if telemetry is not None:
+                    for game_log in new_logs:
+                        telemetry.game_finished(
+                            job_telemetry, game_log,
+                            os.path.getmtime(os.path.join(out_dir, game_log)))
+                    now = time.time()
+                    if not process_done:
+                        telemetry.sample(job_telemetry, now)
+                    for message in telemetry.check_stragglers(now):
+                        print(message)
+
+                if prune_logs:
+                    now = time.time()
+                    for game_log in log_order:
+                        if game_log in pruned_logs:
+                            continue
+                        log_path = os.path.join(out_dir, game_log)
+                        if not process_done and now - os.path.getmtime(
+                                log_path) < PRUNE_SETTLE_SECONDS:
+                            continue
+                        with PROFILER.span("prune log", cat="io", log=game_log):
+                            before, after = prune_game_log_file(log_path)
+                        pruned_logs.add(game_log)
+                        pruned_bytes[0] += before
+                        pruned_bytes[1] += after
+
                 if time.time() - start_time > TIMEOUT:
                     raise TimeoutError()
+            PROFILER.add_span("forge process", profile_start,
+                              time.perf_counter(), cat="forge", job=out_dir,
+                              returncode=proc.returncode)
+            if telemetry is not None:
+                telemetry.end_job(job_telemetry, proc.returncode)
+            print(format_startup_report(os.path.basename(out_dir), start_time,
+                                        log_times))
+            if pruned_logs:
+                print(f"Pruned {len(pruned_logs)} logs in "
+                      f"{os.path.basename(out_dir)}: "
+                      f"{pruned_bytes[0] / 2**20:0.1f} MiB -> "
+                      f"{pruned_bytes[1] / 2**20:0.1f} MiB")
 
             if pbar is not None:
                 pbar.n = games
@@ -63,8 +172,9 @@ def run_sim(out_dir: str,
             warnings = []
             warning_patterns = [re.compile(r"unsupported card", re.IGNORECASE)]
             try:
-                with open(raw_log_path, "r", encoding="utf-8",
-                          errors="ignore") as lf:
+                with PROFILER.span("warning scan", cat="io", job=out_dir), \
+                        open(raw_log_path, "r", encoding="utf-8",
+                             errors="ignore") as lf:
                     for line in lf:
                         if any(pat.search(line) for pat in warning_patterns):
                             warnings.append(line.rstrip())
@@ -90,7 +200,12 @@ def run_sim(out_dir: str,
             return  False
 
 
-def main():
+def run_sim_profiled(out_dir: str, *args, **kwargs):
+    with PROFILER.span("job", cat="collect", job=out_dir):
+        return run_sim(out_dir, *args, **kwargs)
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Parallel Forge matchup data collection.")
     parser.add_argument(
@@ -107,10 +222,38 @@ def main():
     parser.add_argument("--quiet",
                         action="store_true",
                         help="Pass -q to Forge for minimal output")
+    parser.add_argument("--dashboard",
+                        type=int,
+                        metavar="PORT",
+                        help="Serve a live dashboard of this run's games on "
+                        "localhost at this port")
+    parser.add_argument("--profile",
+                        action="store_true",
+                        help="Record per-stage timings to profile_collect.*")
+    parser.add_argument("--prune-logs",
+                        action="store_true",
+                        help="Strip each finished game log down to the events "
+                        "process_logs uses, replacing the raw log")
+    parser.add_argument("--startup-cache",
+                        action="store_true",
+                        help="Start Forge from an AppCDS class archive, built "
+                        "once per Forge jar and rebuilt when the jar changes")
+    parser.add_argument("--paired",
+                        action="store_true",
+                        help="Run jobs in pairs with the decks' seats swapped, "
+                        "so game n of one job is paired with game n of the "
+                        "other. Also enabled by \"paired\": true in info.json")
+    parser.add_argument("--seed-arg",
+                        help="Forge option that sets its random seed, if the "
+                        "Forge build has one, e.g. --seed-arg=-seed; both "
+                        "jobs of a pair get the same seed. Also read from "
+                        "\"seed_arg\" in info.json")
     parser.add_argument("--forge-args",
                         nargs=argparse.REMAINDER,
                         help="Extra args to pass to Forge after decks")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.profile:
+        PROFILER.enable()
 
     # Open info.json
     with open(os.path.join(args.experiment_dir, "info.json"), "r") as f:
@@ -125,18 +268,43 @@ def main():
         deck_path = os.path.join(decks_dir, deck)
         assert os.path.exists(deck_path), "No deck found at " + deck_path
     
+    paired = args.paired or info_dict.get("paired", False)
+    seed_arg = args.seed_arg or info_dict.get("seed_arg")
+    if paired and args.jobs % 2 != 0:
+        parser.error("--paired requires an even --jobs")
+
     log_dir = os.path.abspath(os.path.join(args.experiment_dir, "logs"))
     os.makedirs(log_dir, exist_ok=True)
-    forge_args = [
-        "-d", deck_a, deck_b, "-D", '"' + decks_dir + '/"', "-f", format,
-    ]
-    if "forge_args" in info_dict:
-        forge_args += info_dict["forge_args"]
-    if args.forge_args:
-        forge_args.append(args.forge_args)
-    
+
+    def make_forge_args(decks):
+        forge_args = [
+            "-d", *decks, "-D", '"' + decks_dir + '/"', "-f", format,
+        ]
+        if "forge_args" in info_dict:
+            forge_args += info_dict["forge_args"]
+        if args.forge_args:
+            forge_args += args.forge_args
+        return forge_args
+
+    forge_args = make_forge_args([deck_a, deck_b])
+
+    jvm_flags = []
+    if args.startup_cache:
+        with PROFILER.span("startup cache", cat="collect"):
+            jvm_flags = get_startup_jvm_flags(str(FORGE_CMD), FORGE_BIN_DIR,
+                                              forge_args)
+
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S%f")[:-3]
+
+    if args.dashboard is not None:
+        from goldfaish.live_dashboard import start_dashboard
+        dashboard_server, dashboard_watcher = start_dashboard(
+            log_dir,
+            args.experiment_dir,
+            port=args.dashboard,
+            pattern=timestamp + "_*/*.log")
     
+    telemetry = RunTelemetry(timestamp, info=info_dict)
     results = []
     # Create a progress bar for each job
     pbars = [
@@ -146,16 +314,42 @@ def main():
     with ThreadPoolExecutor(max_workers=args.jobs) as executor:
         futures = []
         for k, pbar in enumerate(pbars):
-            out_dir = os.path.join(log_dir, timestamp + "_job_" + str(k))
+            job_forge_args = forge_args
+            if paired:
+                # Jobs 2i and 2i + 1 are pair i, the latter with seats swapped.
+                swapped = k % 2 == 1
+                job_name = pair_job_name(timestamp, k // 2, swapped)
+                job_forge_args = make_forge_args(
+                    [deck_b, deck_a] if swapped else [deck_a, deck_b])
+                if seed_arg:
+                    if not swapped:
+                        pair_seed = random.randrange(2**31)
+                    job_forge_args += [seed_arg, str(pair_seed)]
+            else:
+                job_name = timestamp + "_job_" + str(k)
+            out_dir = os.path.join(log_dir, job_name)
             os.makedirs(out_dir, exist_ok=False)
-            task = (out_dir, forge_args, args.quiet, args.games)
-            futures.append(executor.submit(run_sim, *task, pbar))
+            task = (out_dir, job_forge_args, args.quiet, args.games)
+            futures.append(
+                executor.submit(run_sim_profiled,
+                                *task,
+                                pbar,
+                                prune_logs=args.prune_logs,
+                                jvm_flags=jvm_flags,
+                                telemetry=telemetry))
         for f in as_completed(futures):
             success = f.result()
             results.append((success))
     for pbar in pbars:
         pbar.close()
+    if args.dashboard is not None:
+        # The last games' logs are still within the watcher's settle window.
+        dashboard_watcher.finish()
+        dashboard_server.shutdown()
     print(f"\nCompleted {len(results)} simulations. {sum(results)} succeeded.")
+    telemetry.save(args.experiment_dir)
+    PROFILER.write(os.path.join(args.experiment_dir, "profile_collect"))
+    PROFILER.reset()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,206 @@
+import argparse
+import abc
+from collections import defaultdict
+import matplotlib.pyplot as plt
+import numpy as np
+from goldfaish.dataset import Experiment, find_experiment_dirs
+from goldfaish.plot_stats import figure_to_html, make_tabbed_html
+
+
+class ComparisonPage:
+    _subclasses = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        ComparisonPage._subclasses.append(cls)
+
+    @classmethod
+    def get_subclasses(cls):
+        return list(cls._subclasses)
+
+    @staticmethod
+    @abc.abstractmethod
+    def title():
+        ...
+
+    @staticmethod
+    @abc.abstractmethod
+    def make(experiments: list):
+        ...
+
+
+def player_label(experiment: Experiment, player_index: int):
+    deck = experiment.decks[player_index]
+    opponent = experiment.decks[1 - player_index]
+    return f"{deck} vs {opponent} ({experiment.name})"
+
+
+class WinRateMatrix(ComparisonPage):
+
+    @staticmethod
+    def title():
+        return "Win Rate Matrix"
+
+    @staticmethod
+    def make(experiments: list):
+        # Pool every experiment that pitted the same two decks against each
+        # other, whichever seat each deck was in.
+        wins = defaultdict(int)
+        games = defaultdict(int)
+        for experiment in experiments:
+            winners = experiment.table.winners
+            decided = int(np.sum(winners >= 0))
+            for k, deck in enumerate(experiment.decks):
+                opponent = experiment.decks[1 - k]
+                wins[(deck, opponent)] += int(np.sum(winners == k))
+                games[(deck, opponent)] += decided
+
+        decks = sorted({deck for deck, _ in games})
+        win_rate = np.full((len(decks), len(decks)), np.nan)
+        for (deck, opponent), n in games.items():
+            if n > 0:
+                win_rate[decks.index(deck),
+                         decks.index(opponent)] = wins[(deck, opponent)] / n
+
+        size = max(4, 1.2 * len(decks) + 2)
+        fig, ax = plt.subplots(figsize=(size, size), dpi=150)
+        image = ax.imshow(win_rate, cmap="RdYlGn", vmin=0., vmax=1.)
+        for row, deck in enumerate(decks):
+            for col, opponent in enumerate(decks):
+                n = games.get((deck, opponent), 0)
+                if n == 0:
+                    continue
+                ax.text(col,
+                        row,
+                        f"{win_rate[row, col]:0.2f}\nN={n}",
+                        ha="center",
+                        va="center",
+                        fontsize=8)
+        ax.set_xticks(range(len(decks)), decks, rotation=45, ha="right")
+        ax.set_yticks(range(len(decks)), decks)
+        ax.set_xlabel("Opponent")
+        ax.set_ylabel("Deck")
+        ax.set_title("Win rate of deck (row) against opponent (column)")
+        fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+        plt.tight_layout()
+        return figure_to_html()
+
+
+class WinTurnDistributions(ComparisonPage):
+
+    @staticmethod
+    def title():
+        return "Win Turn"
+
+    @staticmethod
+    def make(experiments: list):
+        labels = []
+        won_turns = []
+        for experiment in experiments:
+            table = experiment.table
+            for k in range(len(table.players)):
+                turns = table.num_turns[table.winners == k] // 2
+                if len(turns) == 0:
+                    continue
+                labels.append(f"{player_label(experiment, k)}, N={len(turns)}")
+                won_turns.append(turns)
+        if not won_turns:
+            return "<em>No games won in any experiment.</em>"
+
+        fig, ax = plt.subplots(figsize=(0.6 * len(labels) + 4, 8), dpi=150)
+        ax.boxplot(won_turns, showmeans=True)
+        ax.set_xticks(range(1, len(labels) + 1),
+                      labels,
+                      rotation=45,
+                      ha="right",
+                      fontsize=8)
+        ax.set_ylabel("Win Turn")
+        ax.set_title("Turn on which each deck won")
+        ax.grid(axis="y", alpha=0.3)
+        plt.tight_layout()
+        return figure_to_html()
+
+
+class BoardDevelopment(ComparisonPage):
+    categories = [
+        ("Lands", "lands"),
+        ("Mana production", "mana"),
+        ("Creatures", "creatures"),
+        ("Total Power", "power"),
+    ]
+
+    @staticmethod
+    def title():
+        return "Board Development"
+
+    @staticmethod
+    def make(experiments: list):
+        categories = BoardDevelopment.categories
+        fig, axes = plt.subplots(nrows=len(categories),
+                                 ncols=1,
+                                 figsize=(10, 4 * len(categories)),
+                                 dpi=150,
+                                 sharex='all')
+        axes = np.atleast_1d(axes)
+        phase = "MAIN1"
+        for experiment in experiments:
+            table = experiment.table
+            for k, player in enumerate(table.players):
+                columns = table.rows.get((phase, player))
+                if columns is None:
+                    continue
+                decided = table.winners[columns["game"]] >= 0
+                turns = columns["turn"][decided]
+                counts = np.bincount(turns)
+                # Only draw turns with enough games behind them to mean much.
+                valid = np.flatnonzero(counts >= 3)
+                if len(valid) == 0:
+                    continue
+                for ax, (cat_name, feature) in zip(axes, categories):
+                    sums = np.bincount(turns,
+                                       weights=columns[feature][decided])
+                    ax.plot(valid / 2.,
+                            sums[valid] / counts[valid],
+                            label=player_label(experiment, k),
+                            alpha=0.8)
+        for ax, (cat_name, feature) in zip(axes, categories):
+            ax.set_ylabel(f"Mean {cat_name}")
+            ax.set_xlabel("Turn")
+            ax.tick_params(axis='x', labelbottom=True)
+        axes[0].legend(fontsize=7, loc="upper left")
+        plt.tight_layout()
+        return figure_to_html()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare the results of several experiments.")
+    parser.add_argument(
+        "experiment_dirs",
+        nargs="+",
+        help="Experiment directories, or directories containing experiments.")
+    parser.add_argument("--output",
+                        default="comparison.html",
+                        help="Where to write the comparison report.")
+    args = parser.parse_args(argv)
+
+    experiments = []
+    for experiment_dir in find_experiment_dirs(args.experiment_dirs):
+        experiment = Experiment(experiment_dir)
+        if not experiment.has_data:
+            print(f"Skipping {experiment_dir}, it has no data.json")
+            continue
+        experiments.append(experiment)
+    assert experiments, "No processed experiments found."
+    print(f"Comparing {len(experiments)} experiments.")
+
+    pages = [(cls, (experiments,)) for cls in ComparisonPage.get_subclasses()]
+    html = make_tabbed_html(pages, "Comparison of " + ", ".join(
+        experiment.name for experiment in experiments))
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(html)
+    print(f"Saved comparison to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+'''
+    Loading experiment directories and their processed datasets.
+
+    `data.json` is a full dump of every parsed game and is slow to load and
+    large in memory. Games are therefore loaded into the compact
+    `game_model.Game` form, one game at a time where `data_index.json` allows
+    it. Tools that only need something derived from the games (e.g. the
+    feature table when comparing many experiments) go through `load_cached`,
+    which loads `data.json` once, caches the result next to it and afterwards
+    only reads the much smaller cache.
+'''
+import os
+import json
+import pickle
+import random
+import functools
+
+from goldfaish.features import FEATURES_VERSION, FeatureTable, extract_features
+from goldfaish.game_model import Game
+from goldfaish.process_logs import DATA_INDEX_NAME
+
+FEATURE_CACHE_NAME = "features.pkl"
+
+
+def is_experiment_dir(path) -> bool:
+    return os.path.exists(os.path.join(path, "info.json"))
+
+
+def find_experiment_dirs(paths) -> list:
+    '''
+        Each path is either an experiment directory or a directory whose
+        immediate subdirectories are experiments.
+    '''
+    experiment_dirs = []
+    for path in paths:
+        if is_experiment_dir(path):
+            experiment_dirs.append(path)
+            continue
+        for subdir in sorted(os.listdir(path)):
+            full_subdir = os.path.join(path, subdir)
+            if os.path.isdir(full_subdir) and is_experiment_dir(full_subdir):
+                experiment_dirs.append(full_subdir)
+    return experiment_dirs
+
+
+def load_data(experiment_dir) -> dict:
+    '''
+        Returns every game of `data.json` (game id -> `Game`). With an
+        up-to-date `data_index.json` each game is parsed and converted on its
+        own, so the nested dicts of the whole file never exist at once;
+        without one the file is parsed whole, then converted game by game.
+    '''
+    data_json = os.path.join(experiment_dir, "data.json")
+    assert os.path.exists(data_json), data_json
+    index = load_data_index(experiment_dir)
+    if index is not None:
+        return read_games(experiment_dir, index, list(index))
+    with open(data_json, "r") as f:
+        data = json.load(f)
+    # Pop each game as it is converted, so its dicts can be freed right away.
+    return {
+        game_id: Game.from_dict(data.pop(game_id))
+        for game_id in list(data)
+    }
+
+
+def load_data_index(experiment_dir):
+    '''
+        Returns the per-game index `process_logs` writes next to `data.json`,
+        or None if it is missing or older than `data.json`.
+    '''
+    data_json = os.path.join(experiment_dir, "data.json")
+    index_path = os.path.join(experiment_dir, DATA_INDEX_NAME)
+    if not os.path.exists(index_path) or os.path.getmtime(
+            index_path) < os.path.getmtime(data_json):
+        return None
+    with open(index_path, "r") as f:
+        return json.load(f)
+
+
+def read_games(experiment_dir, index: dict, game_ids) -> dict:
+    '''
+        Reads just the games `game_ids` from `data.json`, located through its
+        `index`.
+    '''
+    games = {}
+    with open(os.path.join(experiment_dir, "data.json"), "rb") as f:
+        for game_id in game_ids:
+            f.seek(index[game_id]["offset"])
+            games[game_id] = Game.from_dict(
+                json.loads(f.read(index[game_id]["length"])))
+    return games
+
+
+def stratified_sample(strata: dict, n: int, seed=0) -> list:
+    '''
+        Picks `n` of the keys of `strata` (key -> stratum), at random within
+        each stratum and with every stratum represented in proportion to its
+        size (largest remainder). The sample is self-weighting, so plain
+        estimates over it are unbiased for the whole set.
+    '''
+    if n >= len(strata):
+        return list(strata)
+    members = {}
+    for key, stratum in strata.items():
+        members.setdefault(stratum, []).append(key)
+    quotas = {
+        stratum: n * len(keys) / len(strata)
+        for stratum, keys in members.items()
+    }
+    counts = {stratum: int(quota) for stratum, quota in quotas.items()}
+    by_remainder = sorted(quotas,
+                          key=lambda stratum: quotas[stratum] - counts[stratum],
+                          reverse=True)
+    for stratum in by_remainder[:n - sum(counts.values())]:
+        counts[stratum] += 1
+    rng = random.Random(seed)
+    chosen = set()
+    for stratum, keys in members.items():
+        chosen.update(rng.sample(keys, counts[stratum]))
+    return [key for key in strata if key in chosen]
+
+
+def load_data_sample(experiment_dir, n: int, seed=0):
+    '''
+        Loads a sample of `n` games stratified by winner and loss reason.
+        Returns (the sampled games, in `data.json` order, total number of
+        games). With a `data_index.json` only the sampled games are read;
+        without one the whole of `data.json` is loaded first.
+    '''
+    index = load_data_index(experiment_dir)
+    if index is None:
+        print(f"No up-to-date {DATA_INDEX_NAME}, loading all of data.json; "
+              "re-run process_logs to preview without it.")
+        data = load_data(experiment_dir)
+        strata = {
+            game_id: (game["winner"], game.get("loss_reason"))
+            for game_id, game in data.items()
+        }
+        return {
+            game_id: data[game_id]
+            for game_id in stratified_sample(strata, n, seed)
+        }, len(data)
+
+    strata = {
+        game_id: (entry["winner"], entry["loss_reason"])
+        for game_id, entry in index.items()
+    }
+    return read_games(experiment_dir, index,
+                      stratified_sample(strata, n, seed)), len(index)
+
+
+def load_cached(experiment_dir, cache_name, version, build, rebuild=False):
+    '''
+        Returns `build(data)` for the experiment's dataset, from the cache file
+        `cache_name` if it is newer than `data.json` and was written with the
+        same `version`.
+    '''
+    data_json = os.path.join(experiment_dir, "data.json")
+    cache_path = os.path.join(experiment_dir, cache_name)
+    if not rebuild and os.path.exists(cache_path) and os.path.getmtime(
+            cache_path) >= os.path.getmtime(data_json):
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        if cached["version"] == version:
+            return cached["value"]
+
+    # Only this function holds the parsed JSON, so it is freed on return.
+    value = build(load_data(experiment_dir))
+    with open(cache_path, "wb") as f:
+        pickle.dump({"version": version, "value": value}, f)
+    return value
+
+
+def load_feature_table(experiment_dir) -> FeatureTable:
+    return load_cached(experiment_dir, FEATURE_CACHE_NAME, FEATURES_VERSION,
+                       extract_features)
+
+
+class Experiment:
+    '''
+        An experiment directory whose `info.json` is read eagerly and whose
+        feature table is only loaded on first access.
+    '''
+
+    def __init__(self, experiment_dir):
+        self.experiment_dir = experiment_dir
+        self.name = os.path.basename(os.path.normpath(experiment_dir))
+        with open(os.path.join(experiment_dir, "info.json"), "r") as f:
+            self.info = json.load(f)
+
+    @property
+    def has_data(self) -> bool:
+        return os.path.exists(os.path.join(self.experiment_dir, "data.json"))
+
+    @property
+    def decks(self) -> list:
+        # Forge seats deck_a as the first player and deck_b as the second.
+        return [
+            os.path.splitext(self.info[key])[0] for key in ("deck_a", "deck_b")
+        ]
+
+    @functools.cached_property
+    def table(self) -> FeatureTable:
+        return load_feature_table(self.experiment_dir)
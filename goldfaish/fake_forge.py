@@ -0,0 +1,322 @@
+'''
+    A stand-in for Forge's `sim` mode, for exercising the pipeline without a
+    Forge install or real CPU hours.
+
+    It takes the same arguments `collect_data` passes Forge (`sim -n N -logDir
+    DIR -d DECK_A DECK_B -D DECKS_DIR -f FORMAT [-q]`, anything else is
+    ignored) and writes one game log per game in Forge's format. Cards come
+    from the decks' .dck files. Each game has a scripted length, winner and
+    loss reason, and the board develops plausibly along the way. Options
+    before `sim` set timing, game lengths and failure modes. Use it by
+    pointing `GOLDFAISH_FORGE_CMD` at it, e.g.
+
+        GOLDFAISH_FORGE_CMD="python goldfaish/fake_forge.py --game-seconds 2" \\
+            goldfaish collect experiments/my_matchup
+
+    Only the standard library is used, so the file runs from any directory
+    without the package installed.
+'''
+import argparse
+import os
+import random
+import sys
+import time
+import zlib
+
+PHASES = [
+    ("UNTAP", "Untap step phase"),
+    ("UPKEEP", "Upkeep step phase"),
+    ("DRAW", "Draw step phase"),
+    ("MAIN1", "Main phase, precombat phase"),
+    ("COMBAT_BEGIN", "Beginning of combat step phase"),
+    ("COMBAT_DECLARE_ATTACKERS", "Declare attackers step phase"),
+    ("COMBAT_END", "End of combat step phase"),
+    ("MAIN2", "Main phase, postcombat phase"),
+    ("END_OF_TURN", "End of turn step phase"),
+    ("CLEANUP", "Cleanup step phase"),
+]
+# The phases `process_logs` parses; `--kept-phases-only` writes just these.
+KEPT_PHASES = ("MAIN1", "CLEANUP")
+# Events between phases that the parser skips.
+NOISE_EVENTS = [
+    "forge.game.event.GameEventSpellCast",
+    "forge.game.event.GameEventZone",
+    "forge.game.event.GameEventCardTapped",
+    "forge.game.event.GameEventPlayerPriority",
+]
+LOSS_REASONS = [
+    ("because life total reached 0", 0.8),
+    ("because of commander damage", 0.1),
+    ("because they attempted to draw from an empty library", 0.05),
+    ("by conceding", 0.05),
+]
+LAND_WORDS = ("Forest", "Island", "Plains", "Swamp", "Mountain", "Wastes",
+              "Tower", "Orchard", "Wilds", "Barrens", "Vista", "Grove",
+              "Stadium", "Land", "Ground", "Fields", "Coast", "Pass")
+FALLBACK_DECK = ["Forest"] * 40 + [f"Bear {k}" for k in range(60)]
+
+
+def read_deck(path):
+    '''
+        Returns (deck name, card names with repeats) from a .dck file.
+    '''
+    name = os.path.splitext(os.path.basename(path))[0]
+    cards = []
+    if not os.path.exists(path):
+        return name, list(FALLBACK_DECK)
+    section = None
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("["):
+                section = line.lower()
+            elif section == "[metadata]" and line.startswith("Name="):
+                name = line[len("Name="):]
+            elif section in ("[main]", "[commander]") and " " in line:
+                count, card = line.split(" ", 1)
+                if count.isdigit():
+                    cards += [card.split("|")[0]] * int(count)
+    return name, cards or list(FALLBACK_DECK)
+
+
+def card_stats(name):
+    '''
+        Stable made-up stats for a card name: (type, mana value, power,
+        toughness). Power and toughness are None for noncreatures.
+    '''
+    if any(word in name for word in LAND_WORDS):
+        return "Land", 0, None, None
+    h = zlib.crc32(name.encode("utf-8"))
+    cmc = 1 + h % 6
+    if (h >> 4) % 3 == 0:
+        return "Artifact", cmc, None, None
+    power = max(cmc - 1 + (h >> 8) % 3 - 1, 0)
+    return "Creature", cmc, power, power + (h >> 12) % 3
+
+
+def card_text(name):
+    card_type, cmc, power, toughness = card_stats(name)
+    fields = [name, "Set:FAK", "Art:1", f"Type:{card_type}"]
+    if card_type == "Land":
+        fields.append("MaxManaProduced:1")
+        return "|".join(fields)
+    if power is not None:
+        fields += [f"Power:{power}", f"Toughness:{toughness}"]
+    fields.append("ManaCost:" + ("{G}" if cmc == 1 else f"{{{cmc - 1}}}{{G}}"))
+    return "|".join(fields)
+
+
+class FakePlayer:
+
+    def __init__(self, name, cards, life, rng):
+        self.name = name
+        self.life = life
+        self.library = list(cards)
+        rng.shuffle(self.library)
+        self.hand = [self.library.pop() for _ in range(min(7, len(self.library)))]
+        self.battlefield = []
+        self.graveyard = []
+        self.exile = []
+
+    def draw(self):
+        if self.library:
+            self.hand.append(self.library.pop())
+
+    def take_turn(self, rng):
+        lands = [card for card in self.hand if card_stats(card)[0] == "Land"]
+        if lands:
+            self.hand.remove(lands[0])
+            self.battlefield.append(lands[0])
+        mana = sum(1 for card in self.battlefield
+                   if card_stats(card)[0] == "Land")
+        for card in sorted(self.hand, key=lambda c: -card_stats(c)[1]):
+            card_type, cmc, _, _ = card_stats(card)
+            if card_type != "Land" and cmc <= mana:
+                mana -= cmc
+                self.hand.remove(card)
+                self.battlefield.append(card)
+        # Some permanents die along the way.
+        if len(self.battlefield) > 4 and rng.random() < 0.2:
+            card = self.battlefield.pop(rng.randrange(len(self.battlefield)))
+            (self.exile if rng.random() < 0.2 else self.graveyard).append(card)
+
+
+def zone_text(cards, brief):
+    if brief:
+        return ";".join(cards)
+    return ";".join(card_text(card) for card in cards)
+
+
+def board_state(players, turn, active, phase, brief_hidden_zones):
+    lines = [f"turn={turn}", f"activeplayer=p{active}", f"activephase={phase}"]
+    for k, player in enumerate(players):
+        lines += [
+            f"p{k}life={player.life}",
+            f"p{k}battlefield={zone_text(player.battlefield, False)}",
+            f"p{k}hand={zone_text(player.hand, False)}",
+            f"p{k}exile={zone_text(player.exile, brief_hidden_zones)}",
+            f"p{k}graveyard={zone_text(player.graveyard, brief_hidden_zones)}",
+            f"p{k}library={zone_text(player.library, brief_hidden_zones)}",
+        ]
+    return "\n".join(lines)
+
+
+def play_game(decks, start_life, args, rng):
+    '''
+        Plays one scripted game and returns (its log lines, number of turns).
+    '''
+    players = [
+        FakePlayer(f"Ai({k + 1})-{name}", cards, start_life, rng)
+        for k, (name, cards) in enumerate(decks)
+    ]
+    num_turns = rng.randint(*args.turns)
+    winner = 0 if rng.random() < args.first_player_win_rate else 1
+    draw = rng.random() < args.draw_rate
+    loser = 1 - winner
+    if not draw and (num_turns - 1) % 2 != winner:
+        # The winner deals the last blow on their own turn.
+        num_turns += 1
+    lines = ["=== Players ==="]
+    lines += [f"{player.name} - {name}" for player, (name, _) in
+              zip(players, decks)]
+
+    for turn in range(1, num_turns + 1):
+        active = (turn - 1) % 2
+        player = players[active]
+        if turn > 1:
+            player.draw()
+        for phase, description in PHASES:
+            if phase == "MAIN1":
+                player.take_turn(rng)
+            elif phase == "COMBAT_END":
+                if active == winner and not draw:
+                    # The loser's life follows a curve that hits 0 on the
+                    # last turn.
+                    players[loser].life = round(
+                        start_life * (1 - (turn / num_turns)**2))
+                elif rng.random() < 0.5:
+                    players[1 - active].life -= rng.randint(1, 3)
+            if args.kept_phases_only and phase not in KEPT_PHASES:
+                continue
+            lines.append(
+                "== GameEvent: forge.game.event.GameEventTurnPhase ===")
+            lines.append(f"{description} Board state")
+            lines.append(
+                board_state(players, turn, active, phase,
+                            args.brief_hidden_zones))
+            if not args.kept_phases_only:
+                event = rng.choice(NOISE_EVENTS)
+                lines.append(f"== GameEvent: {event} ===")
+                lines.append(f"{player.name} {event.rsplit('.', 1)[1]} "
+                             f"{rng.choice(player.battlefield or ['nothing'])}")
+
+    lines.append("== GameEvent: forge.game.event.GameEventGameOutcome ===")
+    if draw:
+        lines.append("result=Game ended in a draw")
+    else:
+        reasons, weights = zip(*LOSS_REASONS)
+        lines.append(f"result={players[winner].name} has won")
+        lines.append(f"{players[loser].name} has lost "
+                     f"{rng.choices(reasons, weights)[0]}")
+    return lines, num_turns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fake Forge simulator for load tests.")
+    parser.add_argument("mode", choices=["sim"])
+    parser.add_argument("-n", type=int, default=1, help="Number of games")
+    parser.add_argument("-logDir", required=True)
+    parser.add_argument("-d", nargs=2, default=["a.dck", "b.dck"])
+    parser.add_argument("-D", default=".")
+    parser.add_argument("-f", default="constructed")
+    parser.add_argument("-q", action="store_true")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--startup-seconds",
+                        type=float,
+                        default=0.,
+                        help="Time before the first game starts")
+    parser.add_argument("--game-seconds",
+                        type=float,
+                        default=0.,
+                        help="Mean wall time of a game; longer games take "
+                        "proportionally longer")
+    parser.add_argument("--turns",
+                        type=int,
+                        nargs=2,
+                        default=[8, 24],
+                        metavar=("MIN", "MAX"),
+                        help="Range of game lengths, in turns of either "
+                        "player")
+    parser.add_argument("--first-player-win-rate", type=float, default=0.5)
+    parser.add_argument("--draw-rate",
+                        type=float,
+                        default=0.,
+                        help="Fraction of games without a winner")
+    parser.add_argument("--straggler-rate",
+                        type=float,
+                        default=0.,
+                        help="Fraction of games that take --straggler-factor "
+                        "times as long")
+    parser.add_argument("--straggler-factor", type=float, default=20.)
+    parser.add_argument("--crash-rate",
+                        type=float,
+                        default=0.,
+                        help="Chance per game that the process dies with a "
+                        "stack trace and exit code 1")
+    parser.add_argument("--truncate-rate",
+                        type=float,
+                        default=0.,
+                        help="Fraction of logs cut off partway through")
+    parser.add_argument("--unsupported-cards",
+                        type=int,
+                        default=0,
+                        help="Number of 'unsupported card' warnings to print")
+    parser.add_argument("--kept-phases-only",
+                        action="store_true",
+                        help="Only write the phases process_logs parses, "
+                        "like a pruned log")
+    parser.add_argument("--brief-hidden-zones",
+                        action="store_true",
+                        help="Write only card names for exile, graveyard and "
+                        "library, which process_logs only counts")
+    args, _ = parser.parse_known_args(argv)
+
+    rng = random.Random(args.seed)
+    log_dir = args.logDir.strip('"')
+    decks_dir = args.D.strip('"')
+    decks = [read_deck(os.path.join(decks_dir, deck)) for deck in args.d]
+    start_life = 40 if args.f.lower() == "commander" else 20
+    mean_turns = sum(args.turns) / 2.
+
+    print("Fake Forge: simulating", args.n, "games of", decks[0][0], "vs",
+          decks[1][0], flush=True)
+    for k in range(args.unsupported_cards):
+        print(f"Unsupported card: Fake Card {k}", flush=True)
+    time.sleep(args.startup_seconds)
+
+    for game_k in range(args.n):
+        game_start = time.time()
+        lines, num_turns = play_game(decks, start_life, args, rng)
+        if rng.random() < args.crash_rate:
+            print("Exception in thread \"main\" java.lang.NullPointerException",
+                  flush=True)
+            print("\tat forge.game.GameAction.checkStateEffects(Fake.java:1)",
+                  flush=True)
+            sys.exit(1)
+        seconds = args.game_seconds * num_turns / mean_turns
+        if rng.random() < args.straggler_rate:
+            seconds *= args.straggler_factor
+        time.sleep(max(seconds - (time.time() - game_start), 0.))
+        if rng.random() < args.truncate_rate:
+            lines = lines[:rng.randrange(4, len(lines))]
+        log_name = f"{decks[0][0]}_vs_{decks[1][0]}_game_{game_k}.log"
+        # Forge writes each game's log once the game is over.
+        with open(os.path.join(log_dir, log_name), "w") as f:
+            f.write("\n".join(lines) + "\n")
+        if not args.q:
+            print(f"Game {game_k + 1} of {args.n} done", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+'''
+    Single-pass feature extraction over a parsed dataset (the contents of
+    `data.json`).
+
+    Every game, turn, phase and player is visited exactly once, and the
+    per-player numbers the report pages care about are stored column-wise in a
+    `FeatureTable`. Each `DataPage` declares the features it reads, so the
+    extraction only computes what at least one page needs.
+'''
+import dataclasses
+from collections import defaultdict
+
+import numpy as np
+
+# Bump whenever extraction changes, so cached tables get rebuilt.
+FEATURES_VERSION = 3
+
+ZONES = ["hand", "battlefield", "graveyard", "exile", "library"]
+ZONE_FEATURES = [f"{zone}_size" for zone in ZONES]
+BOARD_FEATURES = [
+    "lands", "mana", "creatures", "nonland_permanents", "power", "toughness"
+]
+PLAYER_FEATURES = ["life", "hand_lands"] + ZONE_FEATURES + BOARD_FEATURES
+
+
+def get_players(data: dict):
+    return next(iter(data.values()))["players"]
+
+
+def count_lands(cards) -> int:
+    return sum(1 for card in cards if "land" in card["type"].lower())
+
+
+def summarize_battlefield(battlefield) -> dict:
+    '''
+        Walks a battlefield once and returns every board feature for it.
+    '''
+    lands = 0
+    mana = 0
+    creatures = 0
+    nonland_permanents = 0
+    power = 0
+    toughness = 0
+    for card in battlefield:
+        card_type = card["type"]
+        if card_type == "NONE":
+            continue
+        card_type = card_type.lower()
+        if "land" in card_type:
+            lands += 1
+        else:
+            nonland_permanents += 1
+        if "creature" in card_type:
+            creatures += 1
+        mana += card["maxmanaproduced"]
+        if card["power"] != "NONE":
+            power += card["power"]
+        if card["toughness"] != "NONE":
+            toughness += card["toughness"]
+    return {
+        "lands": lands,
+        "mana": mana,
+        "creatures": creatures,
+        "nonland_permanents": nonland_permanents,
+        "power": power,
+        "toughness": toughness,
+    }
+
+
+@dataclasses.dataclass
+class FeatureTable:
+    players: list
+    game_ids: list
+    # Index into `players` of each game's winner, or -1 if nobody won.
+    winners: np.ndarray
+    loss_reasons: list
+    num_turns: np.ndarray
+    # For games of a paired run, the index of the game's seat-swapped pair,
+    # else -1; and whether the game was the swapped one.
+    pair_ids: np.ndarray
+    seat_swapped: np.ndarray
+    # (phase, player) -> column name -> array with one row per recorded turn.
+    # Rows are ordered by game and then turn, and besides the extracted
+    # features always carry "game", "turn" and "active" columns.
+    rows: dict
+
+    @property
+    def num_games(self):
+        return len(self.game_ids)
+
+    def traces(self, player, feature, phase="MAIN1", active_only=False):
+        '''
+            Yields (game_index, turns, values) for every game that had a
+            winner, optionally restricted to the turns `player` was active.
+        '''
+        columns = self.rows.get((phase, player))
+        if columns is None:
+            return
+        mask = self.winners[columns["game"]] >= 0
+        if active_only:
+            mask &= columns["active"]
+        games = columns["game"][mask]
+        if len(games) == 0:
+            return
+        turns = columns["turn"][mask]
+        values = columns[feature][mask]
+        splits = np.flatnonzero(np.diff(games)) + 1
+        for game, turn, value in zip(np.split(games, splits),
+                                     np.split(turns, splits),
+                                     np.split(values, splits)):
+            yield int(game[0]), turn, value
+
+    def complete_pairs(self):
+        '''
+            Returns (unswapped game indices, swapped game indices) of the
+            pairs for which both games were recorded, matched up.
+        '''
+        games = np.flatnonzero(self.pair_ids >= 0)
+        unswapped = {}
+        swapped = {}
+        for game in games:
+            side = swapped if self.seat_swapped[game] else unswapped
+            side[int(self.pair_ids[game])] = game
+        both = sorted(set(unswapped) & set(swapped))
+        return (np.array([unswapped[pair] for pair in both], dtype=np.int64),
+                np.array([swapped[pair] for pair in both], dtype=np.int64))
+
+
+def extract_features(data: dict, features=None) -> FeatureTable:
+    '''
+        Builds a `FeatureTable` from a dataset in one pass. `features` limits
+        extraction to the named entries of `PLAYER_FEATURES`; by default all of
+        them are computed.
+    '''
+    if features is None:
+        features = list(PLAYER_FEATURES)
+    else:
+        unknown = set(features) - set(PLAYER_FEATURES)
+        assert not unknown, f"Unknown features: {sorted(unknown)}"
+        features = [f for f in PLAYER_FEATURES if f in features]
+    zone_features = [(f, f[:-len("_size")]) for f in features
+                     if f in ZONE_FEATURES]
+    board_features = [f for f in features if f in BOARD_FEATURES]
+
+    players = get_players(data)
+    game_ids = []
+    winners = []
+    loss_reasons = []
+    num_turns = []
+    pair_index = {}
+    pair_ids = []
+    seat_swapped = []
+    columns = defaultdict(lambda: defaultdict(list))
+
+    for game_index, (game_id, game) in enumerate(data.items()):
+        game_ids.append(game_id)
+        winner = game["winner"]
+        winners.append(players.index(winner) if winner in players else -1)
+        loss_reasons.append(
+            game.get("loss_reason", "unknown wincon, reprocess logs"))
+        num_turns.append(len(game["turns"]))
+        pair = game.get("pair")
+        if pair is not None and pair["id"] is not None:
+            pair_ids.append(pair_index.setdefault(pair["id"], len(pair_index)))
+        else:
+            pair_ids.append(-1)
+        seat_swapped.append(pair is not None and pair["swapped"])
+
+        for turn_index in sorted(game["turns"], key=int):
+            for phase, state in game["turns"][turn_index].items():
+                for player in players:
+                    player_state = state[player]
+                    cols = columns[(phase, player)]
+                    cols["game"].append(game_index)
+                    cols["turn"].append(int(turn_index))
+                    cols["active"].append(state["activeplayer"] == player)
+                    if "life" in features:
+                        cols["life"].append(int(player_state["life"]))
+                    if "hand_lands" in features:
+                        cols["hand_lands"].append(
+                            count_lands(player_state.get("hand", [])))
+                    for feature, zone in zone_features:
+                        cols[feature].append(player_state["field_sizes"][zone])
+                    if board_features:
+                        summary = summarize_battlefield(
+                            player_state.get("battlefield", []))
+                        for feature in board_features:
+                            cols[feature].append(summary[feature])
+
+    rows = {}
+    for key, cols in columns.items():
+        rows[key] = {
+            name: np.array(values,
+                           dtype=bool if name == "active" else np.int32)
+            for name, values in cols.items()
+        }
+    return FeatureTable(players=players,
+                        game_ids=game_ids,
+                        winners=np.array(winners, dtype=np.int32),
+                        loss_reasons=loss_reasons,
+                        num_turns=np.array(num_turns, dtype=np.int32),
+                        pair_ids=np.array(pair_ids, dtype=np.int32),
+                        seat_swapped=np.array(seat_swapped, dtype=bool),
+                        rows=rows)
@@ -0,0 +1,329 @@
+'''
+    Compact in-memory representation of parsed games.
+
+    A parsed game used to be nested dicts all the way down, with a seven-key
+    dict per card per zone per phase per turn. Here every card row of a game
+    lives in one `CardTable` of typed `array` columns, strings (card names,
+    types, mana costs, life totals) and counter sets are interned into shared
+    pools, and the remaining levels are `__slots__` records.
+
+    All records support the dict-style reads existing code does
+    (`game["turns"][3]["MAIN1"][player]["battlefield"][0]["type"]`, `.get`,
+    `in`, iteration over keys), and `to_dict()` reproduces exactly the nested
+    dicts that are written to `data.json`.
+'''
+import sys
+from array import array
+
+ZONES = ("battlefield", "hand", "exile", "graveyard", "library")
+
+# Stored in place of "NONE" for power and toughness.
+_MISSING = -2**31
+
+
+class ValuePool:
+    '''
+        Maps each distinct (hashable) value to a small integer, shared by all
+        games.
+    '''
+
+    def __init__(self, first=()):
+        self.values = []
+        self.ids = {}
+        for value in first:
+            self.add(value)
+
+    def add(self, value) -> int:
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            if isinstance(value, str):
+                value = sys.intern(value)
+            self.values.append(value)
+            self.ids[value] = value_id
+        return value_id
+
+
+def new_counters_pool() -> ValuePool:
+    # Counters are stored as (name, count) tuples; id 0 is "no counters".
+    return ValuePool(first=[()])
+
+
+# The pools new games are added to. Each `CardTable` keeps the pools it was
+# built with, so `reset_pools` never invalidates games that are still alive.
+STRINGS = ValuePool()
+COUNTERS = new_counters_pool()
+
+
+def reset_pools():
+    '''
+        Starts new, empty pools for the games parsed from now on. Called
+        between stages run in one process, so the pools don't keep every
+        string ever seen alive.
+    '''
+    global STRINGS, COUNTERS
+    STRINGS = ValuePool()
+    COUNTERS = new_counters_pool()
+
+
+class Record:
+    '''
+        Read-only dict-style access to a slotted record's `_fields`.
+    '''
+    __slots__ = ()
+    _fields = ()
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def keys(self):
+        return list(self._fields)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def to_dict(self) -> dict:
+        return {key: to_plain(value) for key, value in self.items()}
+
+
+def to_plain(value):
+    if isinstance(value, (Record, CardList)):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: to_plain(v) for key, v in value.items()}
+    return value
+
+
+class CardTable:
+    '''
+        Every card row of one game, column-wise. Zones are contiguous row
+        ranges, see `CardList`.
+    '''
+    __slots__ = ("name", "type", "manacost", "power", "toughness",
+                 "maxmanaproduced", "counters", "strings", "counter_sets")
+
+    def __init__(self):
+        self.strings = STRINGS
+        self.counter_sets = COUNTERS
+        self.name = array("I")
+        self.type = array("I")
+        self.manacost = array("I")
+        self.power = array("i")
+        self.toughness = array("i")
+        self.maxmanaproduced = array("i")
+        self.counters = array("I")
+
+    def __len__(self):
+        return len(self.name)
+
+    def append(self, card: dict):
+        self.name.append(self.strings.add(card["name"]))
+        self.type.append(self.strings.add(card["type"]))
+        self.manacost.append(self.strings.add(card["manacost"]))
+        self.power.append(_MISSING if card["power"] ==
+                          "NONE" else card["power"])
+        self.toughness.append(_MISSING if card["toughness"] ==
+                              "NONE" else card["toughness"])
+        self.maxmanaproduced.append(card["maxmanaproduced"])
+        self.counters.append(
+            self.counter_sets.add(tuple(card["counters"].items())))
+
+
+class Card(Record):
+    '''
+        A view of one row of a `CardTable`.
+    '''
+    __slots__ = ("table", "row")
+    _fields = ("name", "type", "power", "toughness", "manacost",
+               "maxmanaproduced", "counters")
+
+    def __init__(self, table: CardTable, row: int):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, key):
+        table = self.table
+        row = self.row
+        match key:
+            case "name":
+                return table.strings.values[table.name[row]]
+            case "type":
+                return table.strings.values[table.type[row]]
+            case "manacost":
+                return table.strings.values[table.manacost[row]]
+            case "power":
+                value = table.power[row]
+                return "NONE" if value == _MISSING else value
+            case "toughness":
+                value = table.toughness[row]
+                return "NONE" if value == _MISSING else value
+            case "maxmanaproduced":
+                return table.maxmanaproduced[row]
+            case "counters":
+                return dict(table.counter_sets.values[table.counters[row]])
+        raise KeyError(key)
+
+    def __repr__(self):
+        return f"Card({self.to_dict()})"
+
+
+class CardList:
+    '''
+        A zone: the rows [start, stop) of a `CardTable`, as a sequence of
+        `Card`s.
+    '''
+    __slots__ = ("table", "start", "stop")
+
+    def __init__(self, table: CardTable, start: int, stop: int):
+        self.table = table
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return Card(self.table, self.start + index)
+
+    def __iter__(self):
+        for row in range(self.start, self.stop):
+            yield Card(self.table, row)
+
+    def to_dict(self) -> list:
+        return [card.to_dict() for card in self]
+
+
+class FieldSizes(Record):
+    __slots__ = ZONES
+    _fields = ZONES
+
+    def __init__(self, sizes: dict):
+        for zone in ZONES:
+            setattr(self, zone, sizes[zone])
+
+
+class PlayerState(Record):
+    __slots__ = ("life", "battlefield", "hand", "field_sizes")
+    _fields = __slots__
+
+    def __init__(self, life, battlefield, hand, field_sizes):
+        self.life = sys.intern(life)
+        self.battlefield = battlefield
+        self.hand = hand
+        self.field_sizes = field_sizes
+
+
+class GameState(Record):
+    '''
+        The board at one phase of one turn. Besides the fixed fields, each
+        player's name maps to their `PlayerState`.
+    '''
+    __slots__ = ("turn", "activeplayer", "activephase", "player_names",
+                 "player_states")
+    _fields = ("turn", "activeplayer", "activephase")
+
+    def __init__(self, turn, activeplayer, activephase, player_names,
+                 player_states):
+        self.turn = turn
+        self.activeplayer = activeplayer
+        self.activephase = sys.intern(activephase)
+        self.player_names = player_names
+        self.player_states = player_states
+
+    def __getitem__(self, key):
+        if key in self.player_names:
+            return self.player_states[self.player_names.index(key)]
+        return super().__getitem__(key)
+
+    def keys(self):
+        return list(self._fields) + list(self.player_names)
+
+
+class Game(Record):
+    '''
+        One parsed game. `turns` maps turn number -> phase -> `GameState`.
+        `loss_reason` is only present when the log recorded one, and `pair`
+        only for games from a paired run (see `process_logs.get_pair_info`).
+    '''
+    __slots__ = ("turns", "players", "winner", "loss_reason", "pair", "cards")
+    _fields = ("turns", "players", "winner", "loss_reason", "pair")
+
+    def __init__(self, players):
+        self.turns = {}
+        self.players = players
+        self.winner = "NONE"
+        self.loss_reason = None
+        self.pair = None
+        self.cards = CardTable()
+
+    def keys(self):
+        keys = ["turns", "players", "winner"]
+        if self.loss_reason is not None:
+            keys.append("loss_reason")
+        if self.pair is not None:
+            keys.append("pair")
+        return keys
+
+    def __getitem__(self, key):
+        if key in ("loss_reason", "pair") and getattr(self, key) is None:
+            raise KeyError(key)
+        return super().__getitem__(key)
+
+    def add_cards(self, cards) -> CardList:
+        start = len(self.cards)
+        for card in cards:
+            self.cards.append(card)
+        return CardList(self.cards, start, len(self.cards))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Game":
+        '''
+            Converts a game loaded from `data.json` to the compact form.
+        '''
+        game = cls([sys.intern(p) for p in data["players"]])
+        game.winner = data["winner"]
+        game.loss_reason = data.get("loss_reason")
+        game.pair = data.get("pair")
+        for turn_index, phases in data["turns"].items():
+            turn = {}
+            for phase, state in phases.items():
+                player_states = []
+                for player in game.players:
+                    player_state = state[player]
+                    player_states.append(
+                        PlayerState(
+                            player_state["life"],
+                            game.add_cards(player_state["battlefield"]),
+                            game.add_cards(player_state["hand"]),
+                            FieldSizes(player_state["field_sizes"])))
+                turn[sys.intern(phase)] = GameState(
+                    state["turn"], sys.intern(state["activeplayer"]),
+                    state["activephase"], game.players, tuple(player_states))
+            game.turns[int(turn_index)] = turn
+        return game
@@ -0,0 +1,361 @@
+'''
+    A local web page that follows an experiment while it is being simulated.
+
+    A background thread polls the logs directory, parses each game log once it
+    has stopped changing, and folds only that game into running totals (win
+    counts, win-turn histogram, per-turn board sums). The page served on
+    localhost polls those totals as JSON and draws them with plain SVG, so it
+    works fully offline.
+
+        python -m goldfaish.live_dashboard <experiment dir> --port 8765
+
+    `collect_data --dashboard PORT` starts the same server for the logs of the
+    run it launches.
+'''
+import os
+import html
+import glob
+import json
+import time
+import argparse
+import threading
+import traceback
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from goldfaish.features import extract_features
+from goldfaish.process_logs import get_pair_info, parse_game_log_file
+
+# Features drawn as mean-per-turn curves, from the MAIN1 board state.
+CURVE_FEATURES = ["life", "lands", "creatures", "power"]
+# Logs modified more recently than this are assumed to still be written.
+SETTLE_SECONDS = 2.
+# Window for the "recent" throughput figure.
+THROUGHPUT_WINDOW_SECONDS = 300.
+
+
+class LiveStats:
+    '''
+        Running totals over all games seen so far. `add_game` only touches the
+        new game, so each update costs the same however many games came before.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.players = None
+        self.num_games = 0
+        self.wins = Counter()
+        self.loss_reasons = Counter()
+        # player -> win turn -> count
+        self.win_turns = defaultdict(Counter)
+        # (player, feature) -> per-turn sums and counts, grown as needed.
+        self.curve_sums = defaultdict(lambda: np.zeros(0))
+        self.curve_counts = defaultdict(lambda: np.zeros(0))
+        self.finish_times = []
+
+    def add_game(self, game: dict, finish_time: float):
+        table = extract_features({"game": game}, CURVE_FEATURES)
+        with self.lock:
+            if self.players is None:
+                self.players = list(table.players)
+            self.num_games += 1
+            self.finish_times.append(finish_time)
+            winner = int(table.winners[0])
+            if winner < 0:
+                return
+            player = table.players[winner]
+            self.wins[player] += 1
+            self.loss_reasons[table.loss_reasons[0]] += 1
+            self.win_turns[player][int(table.num_turns[0]) // 2] += 1
+            for p in table.players:
+                columns = table.rows.get(("MAIN1", p))
+                if columns is None:
+                    continue
+                length = int(columns["turn"].max()) + 1
+                counts = np.bincount(columns["turn"], minlength=length)
+                for feature in CURVE_FEATURES:
+                    key = (p, feature)
+                    sums = np.bincount(columns["turn"],
+                                       weights=columns[feature],
+                                       minlength=length)
+                    self.curve_sums[key] = add_padded(self.curve_sums[key],
+                                                      sums)
+                    self.curve_counts[key] = add_padded(
+                        self.curve_counts[key], counts)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            now = time.time()
+            elapsed = max(now - self.started, 1e-6)
+            window = min(THROUGHPUT_WINDOW_SECONDS, elapsed)
+            recent = sum(1 for t in self.finish_times if t >= now - window)
+            curves = {}
+            for (player, feature), sums in self.curve_sums.items():
+                counts = self.curve_counts[(player, feature)]
+                valid = np.flatnonzero(counts >= 3)
+                curves.setdefault(feature, {})[player] = {
+                    "turns": (valid / 2.).tolist(),
+                    "means": (sums[valid] / counts[valid]).tolist(),
+                }
+            decided = sum(self.wins.values())
+            return {
+                "players": self.players or [],
+                "num_games": self.num_games,
+                "decided_games": decided,
+                "wins": dict(self.wins),
+                "loss_reasons": dict(self.loss_reasons),
+                "win_turns": {
+                    player: {str(k): v for k, v in sorted(turns.items())}
+                    for player, turns in self.win_turns.items()
+                },
+                "curves": curves,
+                "elapsed_seconds": elapsed,
+                "games_per_minute": 60. * self.num_games / elapsed,
+                "recent_games_per_minute": 60. * recent / max(window, 1e-6),
+            }
+
+
+def add_padded(a, b):
+    if len(a) < len(b):
+        a = np.pad(a, (0, len(b) - len(a)))
+    elif len(b) < len(a):
+        b = np.pad(b, (0, len(a) - len(b)))
+    return a + b
+
+
+class LogWatcher(threading.Thread):
+    '''
+        Feeds every finished log matching `pattern` under `logs_dir` into
+        `stats`, exactly once.
+    '''
+
+    def __init__(self, stats: LiveStats, logs_dir, pattern="**/*.log",
+                 poll_seconds=2.):
+        super().__init__(daemon=True)
+        self.stats = stats
+        self.logs_dir = logs_dir
+        self.pattern = pattern
+        self.poll_seconds = poll_seconds
+        self.seen = set()
+        self.stop_event = threading.Event()
+
+    def poll(self, settle_seconds=SETTLE_SECONDS):
+        now = time.time()
+        for log_subpath in glob.glob(self.pattern, root_dir=self.logs_dir,
+                                     recursive=True):
+            if log_subpath in self.seen:
+                continue
+            log_path = os.path.join(self.logs_dir, log_subpath)
+            try:
+                mtime = os.path.getmtime(log_path)
+                if now - mtime < settle_seconds:
+                    continue
+                self.seen.add(log_subpath)
+                with open(log_path, "r") as f:
+                    game = parse_game_log_file(f,
+                                               pair=get_pair_info(log_path))
+                self.stats.add_game(game, finish_time=mtime)
+            except Exception:
+                print(f"Error reading {log_path}")
+                traceback.print_exc()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.poll()
+            self.stop_event.wait(self.poll_seconds)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def finish(self):
+        '''
+            Stops polling and picks up every remaining log, including ones
+            too new to have settled. Only call once nothing writes logs any
+            more.
+        '''
+        self.stop()
+        self.join()
+        self.poll(settle_seconds=0.)
+
+
+def make_handler(stats: LiveStats, title: str):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path == "/stats.json":
+                body = json.dumps(stats.snapshot()).encode("utf-8")
+                content_type = "application/json"
+            elif self.path in ("/", "/index.html"):
+                body = DASHBOARD_HTML.replace(
+                    "{{title}}", html.escape(title)).encode("utf-8")
+                content_type = "text/html; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Keep request logging out of the collection progress bars.
+            pass
+
+    return Handler
+
+
+def start_dashboard(logs_dir, title, port=8765, pattern="**/*.log"):
+    '''
+        Starts the HTTP server and the log watcher in daemon threads and
+        returns (server, watcher); call `server.shutdown()` and `watcher.stop()`
+        (or `watcher.finish()`) to stop them.
+    '''
+    stats = LiveStats()
+    # Bind first, so a port in use fails before the watcher thread starts.
+    server = ThreadingHTTPServer(("127.0.0.1", port),
+                                 make_handler(stats, title))
+    watcher = LogWatcher(stats, logs_dir, pattern=pattern)
+    watcher.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Live dashboard at http://127.0.0.1:{port}/")
+    return server, watcher
+
+
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<title>{{title}}</title>
+<style>
+body { font-family: sans-serif; margin: 20px; }
+.row { display: flex; flex-wrap: wrap; gap: 24px; }
+.card { border: 1px solid #ccc; padding: 8px 12px; }
+svg text { font-size: 11px; }
+</style>
+</head>
+<body>
+<h2>{{title}}</h2>
+<div id="summary" class="card"></div>
+<h3>Win rate</h3><div id="wins" class="row"></div>
+<h3>Win turn</h3><div id="win_turns" class="row"></div>
+<h3>Board development (mean at start of MAIN1)</h3><div id="curves" class="row"></div>
+<script>
+const COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728"];
+const W = 420, H = 220, PAD = 36;
+
+// Player names and loss reasons come from the logs; escape them like
+// html.escape does before they go into markup.
+function esc(text) {
+  return String(text).replace(/&/g, "&amp;").replace(/</g, "&lt;")
+    .replace(/>/g, "&gt;").replace(/"/g, "&quot;").replace(/'/g, "&#x27;");
+}
+function svg(inner) {
+  return `<svg width="${W}" height="${H}">${inner}</svg>`;
+}
+function axes(xmin, xmax, ymin, ymax, label) {
+  const sx = x => PAD + (x - xmin) / Math.max(xmax - xmin, 1e-9) * (W - 2 * PAD);
+  const sy = y => H - PAD - (y - ymin) / Math.max(ymax - ymin, 1e-9) * (H - 2 * PAD);
+  let g = `<line x1="${PAD}" y1="${H - PAD}" x2="${W - PAD}" y2="${H - PAD}" stroke="black"/>`;
+  g += `<line x1="${PAD}" y1="${PAD}" x2="${PAD}" y2="${H - PAD}" stroke="black"/>`;
+  g += `<text x="${PAD}" y="${PAD - 8}">${esc(label)}</text>`;
+  g += `<text x="${PAD - 4}" y="${H - PAD}" text-anchor="end">${ymin.toFixed(1)}</text>`;
+  g += `<text x="${PAD - 4}" y="${PAD + 4}" text-anchor="end">${ymax.toFixed(1)}</text>`;
+  g += `<text x="${PAD}" y="${H - PAD + 14}">${xmin}</text>`;
+  g += `<text x="${W - PAD}" y="${H - PAD + 14}" text-anchor="end">${xmax}</text>`;
+  return [g, sx, sy];
+}
+function legend(players) {
+  return players.map((p, k) =>
+    `<text x="${W - PAD}" y="${PAD + 14 * k}" text-anchor="end" fill="${COLORS[k % 4]}">${esc(p)}</text>`).join("");
+}
+
+function render(s) {
+  document.getElementById("summary").innerHTML =
+    `${s.num_games} games parsed (${s.decided_games} decided) in ${(s.elapsed_seconds / 60).toFixed(1)} min. ` +
+    `Throughput: ${s.games_per_minute.toFixed(2)} games/min overall, ` +
+    `${s.recent_games_per_minute.toFixed(2)} games/min recently.`;
+
+  // Win rate bars
+  let [g, sx, sy] = axes(0, s.players.length, 0, 1, "Win rate");
+  s.players.forEach((p, k) => {
+    const rate = s.decided_games ? (s.wins[p] || 0) / s.decided_games : 0;
+    g += `<rect x="${sx(k) + 10}" y="${sy(rate)}" width="${sx(1) - sx(0) - 20}" height="${sy(0) - sy(rate)}" fill="${COLORS[k % 4]}"/>`;
+    g += `<text x="${sx(k + 0.5)}" y="${sy(rate) - 4}" text-anchor="middle">${esc(p)}: ${(100 * rate).toFixed(1)}% (${s.wins[p] || 0})</text>`;
+  });
+  let reasons = Object.entries(s.loss_reasons).map(([r, n]) => `<li>${esc(r)}: ${n}</li>`).join("");
+  document.getElementById("wins").innerHTML = svg(g) + `<ul>${reasons}</ul>`;
+
+  // Win turn histograms
+  let turns = [].concat(...Object.values(s.win_turns).map(t => Object.keys(t).map(Number)));
+  if (turns.length) {
+    const tmin = Math.min(...turns), tmax = Math.max(...turns) + 1;
+    let ymax = 0;
+    Object.values(s.win_turns).forEach(t => Object.values(t).forEach(n => ymax = Math.max(ymax, n)));
+    [g, sx, sy] = axes(tmin, tmax, 0, ymax, "Games won on turn");
+    s.players.forEach((p, k) => {
+      const bw = (sx(1) - sx(0)) / s.players.length;
+      Object.entries(s.win_turns[p] || {}).forEach(([t, n]) => {
+        g += `<rect x="${sx(Number(t)) + k * bw}" y="${sy(n)}" width="${bw}" height="${sy(0) - sy(n)}" fill="${COLORS[k % 4]}" opacity="0.8"/>`;
+      });
+    });
+    document.getElementById("win_turns").innerHTML = svg(g + legend(s.players));
+  }
+
+  // Board curves
+  let html = "";
+  for (const [feature, by_player] of Object.entries(s.curves)) {
+    const xs = [].concat(...Object.values(by_player).map(c => c.turns));
+    const ys = [].concat(...Object.values(by_player).map(c => c.means));
+    if (!xs.length) continue;
+    [g, sx, sy] = axes(Math.min(...xs), Math.max(...xs), Math.min(0, ...ys), Math.max(...ys), feature);
+    s.players.forEach((p, k) => {
+      const c = by_player[p];
+      if (!c) return;
+      const pts = c.turns.map((t, i) => `${sx(t)},${sy(c.means[i])}`).join(" ");
+      g += `<polyline points="${pts}" fill="none" stroke="${COLORS[k % 4]}" stroke-width="2"/>`;
+    });
+    html += svg(g + legend(s.players));
+  }
+  document.getElementById("curves").innerHTML = html;
+}
+
+function refresh() {
+  fetch("/stats.json").then(r => r.json()).then(render).catch(() => {});
+}
+refresh();
+setInterval(refresh, 2000);
+</script>
+</body>
+</html>
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve a live dashboard of an experiment's games.")
+    parser.add_argument("experiment_dir", help="Experiment directory.")
+    parser.add_argument("--port",
+                        type=int,
+                        default=8765,
+                        help="Port to serve on, on localhost only.")
+    args = parser.parse_args(argv)
+
+    logs_dir = os.path.join(args.experiment_dir, "logs")
+    server, watcher = start_dashboard(logs_dir,
+                                      args.experiment_dir,
+                                      port=args.port)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    server.shutdown()
+    watcher.stop()
+
+
+if __name__ == '__main__':
+    main()
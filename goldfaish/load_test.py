@@ -0,0 +1,259 @@
+'''
+    End-to-end load test of the pipeline, with `fake_forge.py` standing in for
+    Forge.
+
+    Builds throwaway experiments in an empty directory and runs every stage
+    on them as its own process, the way a user would:
+      - collect: `collect_data` with --jobs concurrent fake Forge jobs per
+        experiment, all experiments at once.
+      - glob: the `**/*.log` discovery `process_logs` and
+        `rerun_all_experiments` do, timed in this process.
+      - process: `process_logs` on each experiment.
+      - plot: `plot_stats` on each experiment.
+      - rerun: `rerun_all_experiments` over the directory once everything is
+        recorded as up to date, i.e. the cost of checking staleness.
+    Reports wall time, games per second and peak RSS per stage, plus the
+    largest fake Forge RSS from the collect telemetry, and saves them to
+    `load_test.json` in the directory.
+
+        python -m goldfaish.load_test /tmp/load_test --jobs 64 --games 100000
+'''
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+from goldfaish import rerun_all_experiments
+from goldfaish.telemetry import load_telemetry
+
+FAKE_FORGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "fake_forge.py")
+# Small logs, so 100k games fit on disk; they still parse like full ones.
+DEFAULT_FAKE_FORGE_ARGS = [
+    "--kept-phases-only", "--brief-hidden-zones", "--turns", "6", "16"
+]
+DECKS = {
+    "LoadTestRamp": ["20 Forest", "18 Island"] +
+    [f"2 Ramp Creature {k}" for k in range(31)],
+    "LoadTestAggro": ["24 Mountain"] +
+    [f"3 Aggro Creature {k}" for k in range(25)] + ["1 Burn Spell"],
+}
+
+
+def make_experiment(experiment_dir):
+    decks_dir = os.path.join(experiment_dir, "decks")
+    os.makedirs(decks_dir)
+    for name, cards in DECKS.items():
+        with open(os.path.join(decks_dir, name + ".dck"), "w") as f:
+            f.write(f"[metadata]\nName={name}\n[Main]\n" + "\n".join(cards) +
+                    "\n")
+    with open(os.path.join(experiment_dir, "info.json"), "w") as f:
+        json.dump(
+            {
+                "deck_a": "LoadTestRamp.dck",
+                "deck_b": "LoadTestAggro.dck",
+                "format": "constructed",
+            },
+            f,
+            indent=4)
+
+
+def start_stage(module, args, env, output_path):
+    with open(output_path, "w") as out:
+        return subprocess.Popen([sys.executable, "-m", module, *args],
+                                stdout=out,
+                                stderr=subprocess.STDOUT,
+                                env=env)
+
+
+def wait_stage(proc):
+    '''
+        Waits for a stage process. Returns its peak RSS in MiB, where the
+        platform reports it (os.wait4, i.e. not on Windows).
+    '''
+    if not hasattr(os, "wait4"):
+        proc.wait()
+        return None
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 2**10
+    return rusage.ru_maxrss * scale / 2**20
+
+
+def run_stages(name, module, arg_lists, env, work_dir, concurrent=False):
+    '''
+        Runs `module` once per argument list, all at once or one after
+        another, and returns the stage's wall time, peak RSS and failures.
+    '''
+    start = time.perf_counter()
+    peak_rss = []
+    failures = 0
+    procs = []
+    for k, args in enumerate(arg_lists):
+        proc = start_stage(module, args, env,
+                           os.path.join(work_dir, f"{name}_{k}.out"))
+        if concurrent:
+            procs.append(proc)
+        else:
+            peak_rss.append(wait_stage(proc))
+            failures += proc.returncode != 0
+    for proc in procs:
+        peak_rss.append(wait_stage(proc))
+        failures += proc.returncode != 0
+    peak_rss = [rss for rss in peak_rss if rss is not None]
+    return {
+        "stage": name,
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mib": max(peak_rss) if peak_rss else None,
+        "failures": failures,
+    }
+
+
+def find_logs(experiment_dir):
+    return glob.glob("**/*.log", root_dir=os.path.join(experiment_dir, "logs"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load-test the pipeline with a fake Forge.")
+    parser.add_argument("work_dir",
+                        help="Directory to build the experiments in; must be "
+                        "empty or not exist")
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=64,
+                        help="Concurrent fake Forge jobs per experiment")
+    parser.add_argument("--games",
+                        type=int,
+                        default=100000,
+                        help="Total games across all experiments")
+    parser.add_argument("--experiments", type=int, default=1)
+    parser.add_argument("--parallel",
+                        type=int,
+                        default=1,
+                        help="--parallel for rerun_all_experiments")
+    parser.add_argument("--fake-forge-args",
+                        nargs=argparse.REMAINDER,
+                        default=[],
+                        help="Extra fake_forge.py options, e.g. "
+                        "--game-seconds 1 --crash-rate 0.001")
+    args = parser.parse_args(argv)
+
+    work_dir = os.path.abspath(args.work_dir)
+    assert not os.path.exists(work_dir) or not os.listdir(work_dir), \
+        f"{work_dir} is not empty"
+    experiment_dirs = [
+        os.path.join(work_dir, f"experiment_{k}")
+        for k in range(args.experiments)
+    ]
+    for experiment_dir in experiment_dirs:
+        make_experiment(experiment_dir)
+    games_per_job = -(-args.games // (args.experiments * args.jobs))
+    total_games = games_per_job * args.jobs * args.experiments
+
+    fake_forge_args = DEFAULT_FAKE_FORGE_ARGS + args.fake_forge_args
+    env = dict(os.environ)
+    env["GOLDFAISH_FORGE_CMD"] = " ".join(
+        [f'"{sys.executable}"', f'"{FAKE_FORGE_PATH}"', *fake_forge_args])
+    env["GOLDFAISH_FORGE_BIN_DIR"] = work_dir
+    package_root = os.path.dirname(os.path.dirname(FAKE_FORGE_PATH))
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [package_root, env.get("PYTHONPATH")]))
+    print(f"Load test: {len(experiment_dirs)} experiment(s) x {args.jobs} "
+          f"jobs x {games_per_job} games, fake Forge args "
+          f"{' '.join(fake_forge_args)}")
+
+    results = []
+
+    def report(result, games):
+        result["games"] = games
+        result["games_per_second"] = games / max(result["seconds"], 1e-9)
+        results.append(result)
+        rss = result["peak_rss_mib"]
+        print(f"  {result['stage']:8s} {result['seconds']:9.1f} s "
+              f"{result['games_per_second']:9.1f} games/s  peak RSS "
+              f"{'n/a' if rss is None else f'{rss:0.0f} MiB':>9s}  "
+              f"{result['failures']} failed")
+
+    report(
+        run_stages("collect", "goldfaish.collect_data", [[
+            experiment_dir, "--games",
+            str(games_per_job), "--jobs",
+            str(args.jobs), "--quiet"
+        ] for experiment_dir in experiment_dirs],
+                   env,
+                   work_dir,
+                   concurrent=True), total_games)
+    forge_rss = []
+    for experiment_dir in experiment_dirs:
+        for run in load_telemetry(experiment_dir) or []:
+            for job in run["jobs"]:
+                forge_rss += [sample[2] for sample in job["samples"]]
+    if forge_rss:
+        print(f"  largest fake Forge RSS {max(forge_rss) / 2**20:0.0f} MiB")
+
+    start = time.perf_counter()
+    num_logs = sum(
+        len(find_logs(experiment_dir)) for experiment_dir in experiment_dirs)
+    report(
+        {
+            "stage": "glob",
+            "seconds": time.perf_counter() - start,
+            "peak_rss_mib": None,
+            "failures": 0,
+        }, num_logs)
+    print(f"  {total_games - num_logs} games missing, from crashed jobs")
+
+    report(
+        run_stages("process", "goldfaish.process_logs",
+                   [[experiment_dir] for experiment_dir in experiment_dirs],
+                   env, work_dir), num_logs)
+    data_bytes = sum(
+        os.path.getsize(os.path.join(experiment_dir, "data.json"))
+        for experiment_dir in experiment_dirs
+        if os.path.exists(os.path.join(experiment_dir, "data.json")))
+    print(f"  data.json total {data_bytes / 2**20:0.1f} MiB")
+
+    report(
+        run_stages("plot", "goldfaish.plot_stats",
+                   [[experiment_dir] for experiment_dir in experiment_dirs],
+                   env, work_dir), num_logs)
+
+    # Record every stage as done, so the rerun only checks staleness.
+    for experiment_dir in experiment_dirs:
+        rerun_all_experiments.save_state(
+            experiment_dir, {
+                "collect":
+                rerun_all_experiments.collect_inputs(experiment_dir),
+                "process":
+                rerun_all_experiments.process_inputs(experiment_dir),
+                "plot": rerun_all_experiments.plot_inputs(experiment_dir),
+            })
+    report(
+        run_stages("rerun", "goldfaish.rerun_all_experiments",
+                   [[work_dir, "--parallel",
+                     str(args.parallel)]], env, work_dir), num_logs)
+
+    with open(os.path.join(work_dir, "load_test.json"), "w") as f:
+        json.dump(
+            {
+                "experiments": args.experiments,
+                "jobs": args.jobs,
+                "games": total_games,
+                "fake_forge_args": fake_forge_args,
+                "largest_forge_rss_mib":
+                max(forge_rss) / 2**20 if forge_rss else None,
+                "data_json_mib": data_bytes / 2**20,
+                "stages": results,
+            },
+            f,
+            indent=2)
+    print(f"Saved results to {os.path.join(work_dir, 'load_test.json')}")
+
+
+if __name__ == "__main__":
+    main()
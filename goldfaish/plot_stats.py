@@ -1,34 +1,92 @@
 import os
-import json
-import matplotlib.pyplot as plt
 import numpy as np
 from collections import defaultdict
 import abc
 import argparse
 import io
 import base64
-import matplotlib.colors as mcolors
-import numpy as np
-import scipy.stats
-import dataclasses
 from statistics import NormalDist
+from goldfaish.features import FeatureTable, extract_features
+from goldfaish.profiling import PROFILER
+from goldfaish.telemetry import load_telemetry
+
+# Bump whenever the report changes, so `rerun_all_experiments` knows to
+# regenerate existing index.html files.
+REPORT_VERSION = 3
 
+# matplotlib and scipy are slow to import, so they are imported where they are
+# used rather than at module load; `goldfaish` commands that never plot don't
+# pay for them.
 
-def get_players(data: dict):
-    return next(iter(data.values()))["players"]
 
 def mean_confidence_interval(data, confidence=0.95):
+    import scipy.stats
     a = 1.0 * np.array(data)
     n = len(a)
     m, se = np.mean(a), scipy.stats.sem(a)
     h = se * scipy.stats.t.ppf((1 + confidence) / 2., n-1)
     return m, h
 
-def plot_traces_with_errorbars(ax,
-                               traces,
-                               trace_colors: None | list | str = None):
-
-    for k, (x, y) in enumerate(traces):
+def paired_win_rate(table: FeatureTable, player_index, confidence=0.95):
+    '''
+        Win rate of a player from the complete seat-swapped pairs: the mean
+        over pairs of the player's wins in the pair / 2, with the variance
+        estimated over pairs so seat effects shared within a pair cancel.
+        Returns (rate, CI half width, the half width the same games would give
+        if independent, number of pairs), or None with fewer than two pairs.
+    '''
+    unswapped, swapped = table.complete_pairs()
+    num_pairs = len(unswapped)
+    if num_pairs < 2:
+        return None
+    wins = (table.winners == player_index).astype(float)
+    pair_means = (wins[unswapped] + wins[swapped]) / 2.
+    rate = pair_means.mean()
+    z = NormalDist().inv_cdf((1 + confidence) / 2.)
+    h = z * pair_means.std(ddof=1) / np.sqrt(num_pairs)
+    h_independent = z * np.sqrt(rate * (1 - rate) / (2 * num_pairs))
+    return rate, h, h_independent, num_pairs
+
+
+def paired_win_rate_html(table: FeatureTable) -> str:
+    rows = []
+    for k, player in enumerate(table.players):
+        estimate = paired_win_rate(table, k)
+        if estimate is None:
+            return ""
+        rate, h, h_independent, num_pairs = estimate
+        # Independent games it would take for the same CI width.
+        equivalent = ("all" if h == 0 else
+                      f"{2 * num_pairs * (h_independent / h)**2:0.0f}")
+        rows.append(f"<tr><td>{player}</td><td>{rate:0.3f}</td>"
+                    f"<td>&plusmn; {h:0.3f}</td>"
+                    f"<td>&plusmn; {h_independent:0.3f}</td>"
+                    f"<td>{equivalent}</td></tr>")
+    unswapped, swapped = table.complete_pairs()
+    seat_effect = np.mean((table.winners[unswapped] == 0).astype(float) -
+                          (table.winners[swapped] == 0))
+    return (
+        f"<p><b>Paired estimate</b> from {num_pairs} seat-swapped pairs "
+        f"({2 * num_pairs} games).</p>"
+        "<table><tr><th>Player</th><th>Win rate</th><th>95% CI, paired</th>"
+        "<th>95% CI if games were independent</th>"
+        "<th>Independent games for the paired CI</th></tr>" + "".join(rows) +
+        "</table>"
+        f"<p>{table.players[0]} wins {seat_effect:+0.1%} more often in its "
+        "own seat than in the swapped one.</p>")
+
+
+# Above this many traces, a subplot shows a binned 2D histogram of value vs.
+# turn instead of one line per game.
+DENSITY_PLOT_THRESHOLD = 200
+# Number of randomly chosen individual traces drawn over the histogram.
+DENSITY_PLOT_SAMPLE = 0
+
+
+def plot_individual_traces(ax, traces, trace_colors, indices):
+    import matplotlib.colors as mcolors
+    for k in indices:
+        x, y = traces[k]
         if isinstance(trace_colors, list):
             color = trace_colors[k]
         else:
@@ -40,6 +98,38 @@ def plot_traces_with_errorbars(ax,
                         (float(k) / len(traces)) - 0.05) % 1.0
         ax.plot(x, y, alpha=0.2, color=mcolors.hsv_to_rgb(hsv_color))
 
+
+def plot_trace_density(ax, X, Y):
+    # One column per distinct turn value, one row per integer value (merged
+    # into at most 50 rows). Each column is normalized to the fraction of
+    # games at that turn, so sparse late turns stay visible.
+    xs = np.unique(X)
+    step = np.min(np.diff(xs)) if len(xs) > 1 else 1.
+    x_edges = np.append(xs, xs[-1] + step) - step / 2.
+    y_min, y_max = np.min(Y), np.max(Y)
+    y_step = max(1, int(np.ceil((y_max - y_min + 1) / 50)))
+    y_edges = np.arange(y_min, y_max + y_step + 1, y_step) - 0.5
+    counts, _, _ = np.histogram2d(X, Y, bins=[x_edges, y_edges])
+    fractions = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+    ax.pcolormesh(x_edges,
+                  y_edges,
+                  np.ma.masked_equal(fractions, 0).T,
+                  cmap="Greys",
+                  vmin=0.,
+                  vmax=max(float(fractions.max()), 1e-6),
+                  shading="flat")
+
+
+def plot_traces_with_errorbars(ax,
+                               traces,
+                               trace_colors: None | list | str = None,
+                               density_threshold: int | None = None,
+                               density_sample: int | None = None):
+    if density_threshold is None:
+        density_threshold = DENSITY_PLOT_THRESHOLD
+    if density_sample is None:
+        density_sample = DENSITY_PLOT_SAMPLE
+
     # Stack all data
     if len(traces) > 0:
         X = np.concatenate([x for x, y in traces])
@@ -47,38 +137,63 @@ def plot_traces_with_errorbars(ax,
     else:
         return
 
+    if len(traces) > density_threshold:
+        plot_trace_density(ax, X, Y)
+        sample = np.random.default_rng(0).choice(len(traces),
+                                                 size=min(
+                                                     density_sample,
+                                                     len(traces)),
+                                                 replace=False)
+        plot_individual_traces(ax, traces, trace_colors, sorted(sample))
+    else:
+        plot_individual_traces(ax, traces, trace_colors, range(len(traces)))
+
     # Group Y by X
-    y_grouped_by_x = defaultdict(list)
-    for x, y in zip(X, Y):
-        y_grouped_by_x[x].append(y)
-    turns_sorted = sorted(y_grouped_by_x.keys())
-    means = []
-    lowers = []
-    uppers = []
-    valid_x = []
-    for t in turns_sorted:
-        samples = y_grouped_by_x[t]
-        if len(samples) >= 3:
-            mu = np.mean(samples)
-            sigma = np.std(samples, ddof=1)
-            means.append(mu)
-            # 95% CI for normal: mu ± 1.96 * sigma
-            lowers.append(mu - 1.96 * sigma)
-            uppers.append(mu + 1.96 * sigma)
-            valid_x.append(t)
-    if valid_x:
+    turns_sorted, inverse = np.unique(X, return_inverse=True)
+    counts = np.bincount(inverse)
+    means = np.bincount(inverse, weights=Y) / counts
+    squared_errors = np.bincount(inverse, weights=(Y - means[inverse])**2)
+    valid = counts >= 3
+    if np.any(valid):
+        valid_x = turns_sorted[valid]
+        means = means[valid]
+        sigma = np.sqrt(squared_errors[valid] / (counts[valid] - 1))
+        # 95% CI for normal: mu ± 1.96 * sigma
         ax.plot(valid_x, means, color="C0", label="Mean")
         ax.fill_between(valid_x,
-                        lowers,
-                        uppers,
+                        means - 1.96 * sigma,
+                        means + 1.96 * sigma,
                         color="C0",
                         alpha=0.2,
                         label="95% CI")
 
 
+def figure_to_html():
+    # Render the current figure to an inline PNG and close it.
+    import matplotlib.pyplot as plt
+    buf = io.BytesIO()
+    with PROFILER.span("savefig", cat="render"):
+        plt.savefig(buf, format="png", bbox_inches="tight")
+    plt.close()
+    buf.seek(0)
+    img_base64 = base64.b64encode(buf.read()).decode("utf-8")
+    img_html = f'<img src="data:image/png;base64,{img_base64}" style="max-width:100%"/>'
+    return img_html
+
+
 class DataPage:
+    '''
+        One tab of the report. Pages are instantiated per report with the
+        trace plot settings, so they are never shared between reports.
+    '''
     _subclasses = []
 
+    def __init__(self,
+                 density_threshold=DENSITY_PLOT_THRESHOLD,
+                 density_sample=DENSITY_PLOT_SAMPLE):
+        self.density_threshold = density_threshold
+        self.density_sample = density_sample
+
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         DataPage._subclasses.append(cls)
@@ -92,20 +207,33 @@ class DataPage:
     def title():
         ...
 
-    @staticmethod
+    # Names of the per-player features (see `goldfaish.features`) that this
+    # page reads from the feature table.
+    features = []
+
     @abc.abstractmethod
-    def make(data: dict):
+    def make(self, table: FeatureTable):
         ...
 
+    def plot_traces(self, ax, traces, trace_colors=None):
+        plot_traces_with_errorbars(ax,
+                                   traces,
+                                   trace_colors,
+                                   density_threshold=self.density_threshold,
+                                   density_sample=self.density_sample)
+
 
 class FieldSizeByTurn(DataPage):
+    features = ["hand_size", "battlefield_size", "graveyard_size",
+                "exile_size", "library_size"]
 
     @staticmethod
     def title():
         return "Hand/Field/GY Size"
 
-    def make(data: dict):
-        players = get_players(data)
+    def make(self, table: FeatureTable):
+        import matplotlib.pyplot as plt
+        players = table.players
         fields = ["hand", "battlefield", "graveyard", "exile", "library"]
         fig, axes = plt.subplots(
             nrows=len(fields),
@@ -123,24 +251,13 @@ class FieldSizeByTurn(DataPage):
                 all_traces = []
                 trace_colors = []
                 # Collect all traces for this player
-                for game in data.values():
-                    if game["winner"] not in players:
-                        continue
-                    turns = []
-                    field_sizes = []
-                    for turn_index, turn in game["turns"].items():
-                        if turn[phase]["activeplayer"] != player:
-                            continue
-                        turns.append(int(turn_index) // 2)
-                        field_sizes.append(
-                            turn[phase][player]["field_sizes"][field])
-                    if turns:
-                        all_traces.append(
-                            (np.array(turns), np.array(field_sizes)))
-                        trace_colors.append("green" if game["winner"] ==
-                                            player else "red")
-
-                plot_traces_with_errorbars(ax, all_traces, trace_colors)
+                for game_index, turns, field_sizes in table.traces(
+                        player, f"{field}_size", phase, active_only=True):
+                    all_traces.append((turns // 2, field_sizes))
+                    trace_colors.append("green" if table.winners[game_index]
+                                        == i else "red")
+
+                self.plot_traces(ax, all_traces, trace_colors)
                 ax.set_title(player)
                 ax.set_xlabel("Turn")
                 ax.set_ylabel(f"Size of {field} at start of {phase}")
@@ -151,34 +268,30 @@ class FieldSizeByTurn(DataPage):
                     axis='y', labelleft=True)  # Ensure tick labels are visible
         plt.tight_layout()
 
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", bbox_inches="tight")
-        plt.close()
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-        img_html = f'<img src="data:image/png;base64,{img_base64}" style="max-width:100%"/>'
-        return img_html
+        return figure_to_html()
 
 
 class LandsAndCreaturesOnBoard(DataPage):
 
+    features = [
+        "lands", "mana", "creatures", "nonland_permanents", "power",
+        "toughness"
+    ]
+
     @staticmethod
     def title():
         return "Board Presence"
 
-    @staticmethod
-    def make(data: dict):
-        players = get_players(data)
+    def make(self, table: FeatureTable):
+        import matplotlib.pyplot as plt
+        players = table.players
         categories = [
-            ("Lands", lambda card: "land" in card["type"].lower()),
-            ("Mana production", lambda card: card["maxmanaproduced"]),
-            ("Creatures", lambda card: "creature" in card["type"].lower()),
-            ("Nonland Permanents",
-             lambda card: "land" not in card["type"].lower()),
-            ("Total Power", lambda card: card["power"]
-             if card["power"] != "NONE" else 0),
-            ("Total Toughness", lambda card: card["toughness"]
-             if card["toughness"] != "NONE" else 0),
+            ("Lands", "lands"),
+            ("Mana production", "mana"),
+            ("Creatures", "creatures"),
+            ("Nonland Permanents", "nonland_permanents"),
+            ("Total Power", "power"),
+            ("Total Toughness", "toughness"),
         ]
 
         fig, axes = plt.subplots(
@@ -197,30 +310,15 @@ class LandsAndCreaturesOnBoard(DataPage):
             axes = axes[np.newaxis, :]
 
         for col, player in enumerate(players):
-            for row, (cat_name, cat_fn) in enumerate(categories):
+            for row, (cat_name, feature) in enumerate(categories):
                 traces = []
                 trace_colors = []
-                for game in data.values():
-                    if game["winner"] not in players:
-                        continue
-                    turns = []
-                    counts = []
-                    for turn_index, turn in game["turns"].items():
-                        if "battlefield" in turn["MAIN1"][player]:
-                            battlefield = turn["MAIN1"][player]["battlefield"]
-                            count = sum(
-                                cat_fn(card) for card in battlefield
-                                if card["type"] != "NONE")
-                        else:
-                            count = 0
-                        turns.append(float(turn_index) / 2.)
-                        counts.append(count)
-                    if turns:
-                        traces.append((np.array(turns), np.array(counts)))
-                        trace_colors.append("green" if game["winner"] ==
-                                            player else "red")
+                for game_index, turns, counts in table.traces(player, feature):
+                    traces.append((turns / 2., counts))
+                    trace_colors.append("green" if table.winners[game_index]
+                                        == col else "red")
                 ax = axes[row, col]
-                plot_traces_with_errorbars(ax, traces, trace_colors)
+                self.plot_traces(ax, traces, trace_colors)
                 if row == 0:
                     ax.set_title(player)
                 if col == 0:
@@ -246,26 +344,20 @@ class LandsAndCreaturesOnBoard(DataPage):
 
         plt.tight_layout()
 
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", bbox_inches="tight")
-        plt.close()
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-        img_html = f'<img src="data:image/png;base64,{img_base64}" style="max-width:100%"/>'
-        return img_html
+        return figure_to_html()
 
 
 class Life(DataPage):
 
+    features = ["life"]
+
     @staticmethod
     def title():
         return "Life"
 
-    @staticmethod
-    def make(data: dict):
-        players = get_players(data)
-        plt.figure(dpi=300).set_size_inches(12, 6)
-
+    def make(self, table: FeatureTable):
+        import matplotlib.pyplot as plt
+        players = table.players
         fig, axes = plt.subplots(
             nrows=3,
             ncols=len(players),
@@ -281,26 +373,18 @@ class Life(DataPage):
             lost_traces = []
             trace_colors = []
             # Collect all traces for this player
-            for game in data.values():
-                if game["winner"] not in players:
-                    continue
-                turns = []
-                life_totals = []
-                for turn_index, turn in game["turns"].items():
-                    turns.append(float(turn_index) / 2.)
-                    life_totals.append(int(turn["MAIN1"][player]["life"]))
-                if turns:
-                    all_traces.append((np.array(turns), np.array(life_totals)))
-                    won = game["winner"] == player
-                    if won:
-                        won_traces.append(all_traces[-1])
-                    else:
-                        lost_traces.append(all_traces[-1])
-                    trace_colors.append("green" if won else "red")
+            for game_index, turns, life_totals in table.traces(player, "life"):
+                all_traces.append((turns / 2., life_totals))
+                won = table.winners[game_index] == i
+                if won:
+                    won_traces.append(all_traces[-1])
+                else:
+                    lost_traces.append(all_traces[-1])
+                trace_colors.append("green" if won else "red")
 
             # Combined plot
             ax = axes[0, i]
-            plot_traces_with_errorbars(ax, all_traces, trace_colors)
+            self.plot_traces(ax, all_traces, trace_colors)
             ax.set_title(player)
             ax.set_xlabel("Turn")
             ax.set_ylabel("Life")
@@ -310,7 +394,7 @@ class Life(DataPage):
                            labelleft=True)  # Ensure tick labels are visible
 
             ax = axes[1, i]
-            plot_traces_with_errorbars(ax, won_traces, "green")
+            self.plot_traces(ax, won_traces, "green")
             ax.set_title("Only winning games")
             ax.set_xlabel("Turn")
             ax.set_ylabel("Life")
@@ -320,7 +404,7 @@ class Life(DataPage):
                            labelleft=True)  # Ensure tick labels are visible
 
             ax = axes[2, i]
-            plot_traces_with_errorbars(ax, lost_traces, "red")
+            self.plot_traces(ax, lost_traces, "red")
             ax.set_title("Only losing games")
             ax.set_xlabel("Turn")
             ax.set_ylabel("Life")
@@ -331,13 +415,7 @@ class Life(DataPage):
 
         plt.tight_layout()
 
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", bbox_inches="tight")
-        plt.close()
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-        img_html = f'<img src="data:image/png;base64,{img_base64}" style="max-width:100%"/>'
-        return img_html
+        return figure_to_html()
 
 
 class Winning(DataPage):
@@ -346,25 +424,24 @@ class Winning(DataPage):
     def title():
         return "Win Rate and Speed"
 
-    @staticmethod
-    def make(data: dict):
-        players = get_players(data)
+    def make(self, table: FeatureTable):
+        import matplotlib.pyplot as plt
+        players = table.players
         plt.figure(dpi=300).set_size_inches(6, 12)
 
         games_won = {player: 0 for player in players}
         games_won_by_reason = {player: defaultdict(int) for player in players}
         won_durations = {player: [] for player in players}
         all_wincons = set()
-        for game in data.values():
-            winner = game["winner"]
-            if winner not in players:
+        for winner_index, loss_reason, num_turns in zip(
+                table.winners, table.loss_reasons, table.num_turns):
+            if winner_index < 0:
                 continue
-            loss_reason = game.get("loss_reason",
-                                   "unknown wincon, reprocess logs")
+            winner = players[winner_index]
             all_wincons.add(loss_reason)
-            games_won[game["winner"]] += 1
-            games_won_by_reason[game["winner"]][loss_reason] += 1
-            won_durations[game["winner"]].append(len(game["turns"]) // 2)
+            games_won[winner] += 1
+            games_won_by_reason[winner][loss_reason] += 1
+            won_durations[winner].append(int(num_turns) // 2)
 
         ax = plt.subplot(3, 1, 1)
         total_games = sum(list(games_won.values()))
@@ -430,29 +507,120 @@ class Winning(DataPage):
             plt.legend()
             plt.tight_layout()
 
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", bbox_inches="tight")
-        plt.close()
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-        img_html = f'<img src="data:image/png;base64,{img_base64}" style="max-width:100%"/>'
-        return img_html
+        return paired_win_rate_html(table) + figure_to_html()
 
 
-def make_html(data: dict, title):
-    # Generate HTML tabs for each DataPage subclass
-    subclasses = DataPage.get_subclasses()
+class Throughput:
+    '''
+        Simulation throughput from the `collect_data` telemetry. Not a
+        `DataPage`: it reads the telemetry runs rather than the feature table,
+        and is only added when the experiment has telemetry.
+    '''
+
+    @staticmethod
+    def title():
+        return "Simulation Throughput"
+
+    @staticmethod
+    def make(runs):
+        import matplotlib.pyplot as plt
+        jobs = [(run, job) for run in runs for job in run["jobs"]]
+        plt.figure(dpi=150).set_size_inches(8, 14)
+
+        # Games finished over time, one line per job, time from run start.
+        ax = plt.subplot(4, 1, 1)
+        for run, job in jobs:
+            finishes = sorted(game["finish"] - run["start"]
+                              for game in job["games"])
+            ax.step([job["start"] - run["start"]] + finishes,
+                    np.arange(len(finishes) + 1),
+                    where="post",
+                    color="red" if job["straggler"] else "gray",
+                    alpha=0.8 if job["straggler"] else 0.4)
+        plt.title("Games Finished per Job (stragglers in red)")
+        plt.xlabel("Seconds since run start")
+        plt.ylabel("Games")
+
+        # Distribution of game wall time.
+        ax = plt.subplot(4, 1, 2)
+        durations = np.array([
+            game["finish"] - game["start"] for _, job in jobs
+            for game in job["games"] if not game["includes_startup"]
+        ])
+        straggler_durations = np.array([
+            game["finish"] - game["start"] for _, job in jobs
+            for game in job["games"]
+            if game["straggler"] and not game["includes_startup"]
+        ])
+        if len(durations) > 0:
+            # All-zero durations (games faster than the mtime resolution)
+            # would make every bin edge 0.
+            bins = np.linspace(0, max(durations.max(), 1e-3), 50)
+            ax.hist(durations, bins=bins, color="gray", label="games")
+            if len(straggler_durations) > 0:
+                ax.hist(straggler_durations, bins=bins, color="red",
+                        label="stragglers")
+            ax.axvline(np.median(durations), color="black", linestyle="--",
+                       label=f"median {np.median(durations):0.1f}s")
+            plt.legend()
+        plt.title("Game Wall Time (N=%d, excl. first game of each job)" %
+                  len(durations))
+        plt.xlabel("Seconds")
+        plt.ylabel("Games")
+
+        # CPU utilization and RSS of each job's Forge process.
+        ax_cpu = plt.subplot(4, 1, 3)
+        ax_rss = plt.subplot(4, 1, 4)
+        for run, job in jobs:
+            samples = np.array(job["samples"]).reshape(-1, 3)
+            if len(samples) < 2:
+                continue
+            t = samples[:, 0] - run["start"]
+            cpu_percent = 100. * np.diff(samples[:, 1]) / np.diff(samples[:, 0])
+            color = "red" if job["straggler"] else "gray"
+            ax_cpu.plot(t[1:], cpu_percent, color=color, alpha=0.4)
+            ax_rss.plot(t, samples[:, 2] / 2**20, color=color, alpha=0.4)
+        ax_cpu.set_title("Forge CPU Utilization per Job")
+        ax_cpu.set_xlabel("Seconds since run start")
+        ax_cpu.set_ylabel("% of one core")
+        ax_rss.set_title("Forge RSS per Job")
+        ax_rss.set_xlabel("Seconds since run start")
+        ax_rss.set_ylabel("MiB")
+        plt.tight_layout()
+
+        rows = []
+        for run in runs:
+            num_games = sum(len(job["games"]) for job in run["jobs"])
+            minutes = (run.get("end", run["start"]) - run["start"]) / 60.
+            rows.append(
+                f"<tr><td>{run['timestamp']}</td><td>{len(run['jobs'])}</td>"
+                f"<td>{num_games}</td>"
+                f"<td>{num_games / max(minutes, 1e-9):0.1f}</td>"
+                f"<td>{sum(job['straggler'] for job in run['jobs'])}</td>"
+                f"<td>{sum(game['straggler'] for job in run['jobs'] for game in job['games'])}</td></tr>"
+            )
+        table_html = (
+            "<table><tr><th>Run</th><th>Jobs</th><th>Games</th>"
+            "<th>Games/min</th><th>Straggler jobs</th>"
+            "<th>Straggler games</th></tr>" + "".join(rows) + "</table>")
+        return table_html + figure_to_html()
+
+
+def make_tabbed_html(pages, title, banner=None):
+    # Generate one HTML tab per page, calling `page.make(*args)` for content.
+    # `banner` is shown above the tabs.
     tab_headers = []
     tab_contents = []
 
-    for i, cls in enumerate(subclasses):
-        print("Adding tab for ", cls.title())
+    for i, (page, args) in enumerate(pages):
+        print("Adding tab for ", page.title())
         tab_id = f"tab{i}"
         tab_headers.append(
-            f'<button class="tablinks" onclick="openTab(event, \'{tab_id}\')">{cls.title()}</button>'
+            f'<button class="tablinks" onclick="openTab(event, \'{tab_id}\')">{page.title()}</button>'
         )
         try:
-            content = cls.make(data)
+            with PROFILER.span("page", cat="page", title=page.title()):
+                content = page.make(*args)
         except NotImplementedError:
             content = "<em>Not implemented</em>"
         tab_contents.append(
@@ -488,7 +656,7 @@ def make_html(data: dict, title):
     }}
     </style>
     </head>
-    <body>
+    <body>{'' if banner is None else f'<p style="background:#ffd;padding:8px"><b>{banner}</b></p>'}
 
     <div class="tab">
       {''.join(tab_headers)}
@@ -521,23 +689,96 @@ def make_html(data: dict, title):
     return html
 
 
-def main():
+def make_html(data: dict,
+              title,
+              telemetry=None,
+              banner=None,
+              density_threshold=DENSITY_PLOT_THRESHOLD,
+              density_sample=DENSITY_PLOT_SAMPLE):
+    # Generate HTML tabs for each DataPage subclass
+    subclasses = DataPage.get_subclasses()
+    # Extract every feature any page needs in a single pass over the data.
+    with PROFILER.span("extract_features", cat="features"):
+        table = extract_features(
+            data, set().union(*(cls.features for cls in subclasses)))
+    pages = [(cls(density_threshold, density_sample), (table,))
+             for cls in subclasses]
+    if telemetry:
+        pages.append((Throughput, (telemetry,)))
+    return make_tabbed_html(pages, title, banner=banner)
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Process log files into structured stats.")
     parser.add_argument("experiment_dir", help="Experiment directory.")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--density-threshold",
+        type=int,
+        default=DENSITY_PLOT_THRESHOLD,
+        help="Plot a 2D histogram instead of individual traces when a "
+        "subplot has more games than this.")
+    parser.add_argument(
+        "--density-sample",
+        type=int,
+        default=DENSITY_PLOT_SAMPLE,
+        help="Number of random individual traces to draw over a histogram.")
+    parser.add_argument("--profile",
+                        action="store_true",
+                        help="Record per-stage timings to profile_plot.*")
+    parser.add_argument(
+        "--preview",
+        type=int,
+        metavar="N",
+        help="Build the report from N games, stratified by winner and loss "
+        "reason, into index_preview.html.")
+    parser.add_argument("--preview-seed",
+                        type=int,
+                        default=0,
+                        help="Random seed for the --preview sample.")
+    args = parser.parse_args(argv)
+    if args.profile:
+        PROFILER.enable()
 
     data_json = os.path.join(args.experiment_dir, "data.json")
     assert os.path.exists(data_json), data_json
 
-    with open(data_json, "r") as f:
-        data = json.load(f)
+    title = args.experiment_dir
+    banner = None
+    output_name = "index.html"
+    if args.preview is not None:
+        from goldfaish.dataset import load_data_sample
+        with PROFILER.span("load preview sample", cat="io"):
+            data, total_games = load_data_sample(args.experiment_dir,
+                                                 args.preview,
+                                                 seed=args.preview_seed)
+        title = f"{title} (preview, {len(data)} of {total_games} games)"
+        banner = (f"Preview built from {len(data)} of {total_games} games, "
+                  "stratified by winner and loss reason. Every count, mean "
+                  "and confidence interval is computed from these "
+                  f"{len(data)} games only.")
+        output_name = "index_preview.html"
+    else:
+        from goldfaish.dataset import load_data
+        with PROFILER.span("load data.json", cat="io"):
+            data = load_data(args.experiment_dir)
+    if not data:
+        print(f"No games in {data_json}, not writing {output_name}")
+        PROFILER.reset()
+        return
 
-    html = make_html(data, args.experiment_dir)
-    with open(os.path.join(args.experiment_dir, "index.html"),
-              "w",
-              encoding="utf-8") as f:
-        f.write(html)
+    html = make_html(data, title,
+                     telemetry=load_telemetry(args.experiment_dir),
+                     banner=banner,
+                     density_threshold=args.density_threshold,
+                     density_sample=args.density_sample)
+    with PROFILER.span(f"write {output_name}", cat="io"):
+        with open(os.path.join(args.experiment_dir, output_name),
+                  "w",
+                  encoding="utf-8") as f:
+            f.write(html)
+    PROFILER.write(os.path.join(args.experiment_dir, "profile_plot"))
+    PROFILER.reset()
 
 
 if __name__ == '__main__':
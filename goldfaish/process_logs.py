@@ -1,11 +1,69 @@
 import os
-from collections import defaultdict
 import json
 import sys
 import re
 from typing import List, Dict, Any
 import tqdm
 import glob
+import io
+from goldfaish.profiling import PROFILER
+from goldfaish.game_model import (ZONES, FieldSizes, Game, GameState,
+                                  PlayerState)
+
+# Bump whenever parsing changes what ends up in data.json, so
+# `rerun_all_experiments` knows to reprocess existing logs.
+PARSER_VERSION = 1
+
+# Written next to data.json: each game's byte range in it and its outcome, so
+# a few games can be read without loading the whole file.
+DATA_INDEX_NAME = "data_index.json"
+
+EVENT_HEADER = re.compile(r"== GameEvent: (.+) ===")
+TURN_PHASE_EVENT = "forge.game.event.GameEventTurnPhase"
+GAME_OUTCOME_EVENT = "forge.game.event.GameEventGameOutcome"
+# Turn phases whose board state gets parsed; the rest of the log is ignored.
+KEPT_PHASES = ["Main phase, precombat phase", "Cleanup step phase"]
+
+# `collect_data --paired` runs each pair of jobs in "<timestamp>_pair_<k>" and
+# "<timestamp>_pair_<k>_swapped", the latter with the decks' seats swapped.
+# Game n of the one job is paired with game n of the other.
+PAIR_JOB_PATTERN = re.compile(r"^(.*_pair_\d+)(_swapped)?$")
+GAME_NUMBER_PATTERN = re.compile(r"(\d+)\.log$")
+SEAT_PREFIX_PATTERN = re.compile(r"^Ai\(\d+\)-")
+
+
+def pair_job_name(timestamp: str, pair_index: int, swapped: bool) -> str:
+    return f"{timestamp}_pair_{pair_index}" + ("_swapped" if swapped else "")
+
+
+def get_pair_info(log_path):
+    '''
+        For a game log from a paired job returns {"id": ..., "swapped": ...},
+        where the id is shared by the two seat-swapped games of a pair (None if
+        the log name has no game number). Returns None for unpaired logs.
+    '''
+    job_name = os.path.basename(os.path.dirname(os.path.abspath(log_path)))
+    match = PAIR_JOB_PATTERN.match(job_name)
+    if match is None:
+        return None
+    number = GAME_NUMBER_PATTERN.search(os.path.basename(log_path))
+    return {
+        "id": f"{match.group(1)}/{number.group(1)}" if number else None,
+        "swapped": match.group(2) is not None,
+    }
+
+
+def is_kept_turn_phase(data: str) -> bool:
+    return any(phase in data for phase in KEPT_PHASES) and "Board state" in data
+
+
+def is_needed_event(event: str, data: str) -> bool:
+    '''
+        Whether `parse_game_log_file` uses this event block at all.
+    '''
+    if event == TURN_PHASE_EVENT:
+        return is_kept_turn_phase(data)
+    return event == GAME_OUTCOME_EVENT
 
 
 def parse_card_info(data: str) -> dict:
@@ -59,9 +117,13 @@ def parse_card_list(data: str) -> dict:
     return [parse_card_info(x) for x in data.split(";")]
 
 
-def parse_game_state(data: str, player_names_in_order: list[str]) -> dict:
-    out = {}
-
+def parse_game_state(data: str, game: Game, seat_players=None) -> GameState:
+    '''
+        `seat_players` are the players in seat order (p0, p1), if that differs
+        from `game.players`.
+    '''
+    if seat_players is None:
+        seat_players = game.players
     data_as_dict = {}
     for row in data.split("\n"):
         if "=" not in row:
@@ -69,36 +131,43 @@ def parse_game_state(data: str, player_names_in_order: list[str]) -> dict:
         field_name, field_data = row.split("=", 1)
         data_as_dict[field_name] = field_data
 
-    out["turn"] = int(data_as_dict["turn"])
+    turn = int(data_as_dict["turn"])
     player_index = int(data_as_dict["activeplayer"][1])  #p0 or p1 -> 0 or 1
     assert player_index == 0 or player_index == 1, player_index
-    out["activeplayer"] = player_names_in_order[player_index]
-    out["activephase"] = data_as_dict["activephase"]
+    activeplayer = seat_players[player_index]
+    activephase = data_as_dict["activephase"]
 
-    for k, player_name in enumerate(player_names_in_order):
-        player_state = {}
-        out[player_name] = player_state
+    player_states = {}
+    for k, player_name in enumerate(seat_players):
         basename = f"p{k}"
-        player_state["life"] = data_as_dict[f"{basename}life"]
+        zones = {}
         for field_name in ["battlefield", "hand"]:
             combined_name = f"{basename}{field_name}"
             if combined_name not in data_as_dict:
                 print("Data block missing ", combined_name)
                 print(data)
-            player_state[field_name] = parse_card_list(
-                data_as_dict[combined_name])
-        field_sizes = {}
-        for field_name in [
-                "battlefield", "hand", "exile", "graveyard", "library"
-        ]:
-            combined_name = f"{basename}{field_name}"
-            field_sizes[field_name] = len(
+            zones[field_name] = game.add_cards(
                 parse_card_list(data_as_dict[combined_name]))
-        player_state["field_sizes"] = field_sizes
-    return out
+        # Only the sizes of the other zones are kept, which doesn't need the
+        # cards parsed.
+        field_sizes = FieldSizes({
+            field_name: len(data_as_dict[f"{basename}{field_name}"].split(";"))
+            for field_name in ZONES
+        })
+        player_states[player_name] = PlayerState(
+            data_as_dict[f"{basename}life"], zones["battlefield"],
+            zones["hand"], field_sizes)
+    return GameState(turn, activeplayer, activephase, game.players,
+                     tuple(player_states[name] for name in game.players))
 
 
-def parse_game_log_file(log_file) -> dict:
+def parse_game_log_file(log_file, pair=None) -> Game:
+    '''
+        `pair` is the log's `get_pair_info`, if any. The players of a
+        seat-swapped game are renamed and reordered to match the unswapped
+        games, e.g. "Ai(1)-DeckB" becomes "Ai(2)-DeckB", so every game of an
+        experiment has the same players; `pair["swapped"]` keeps the seats.
+    '''
     current_event = None
     current_block = []
 
@@ -107,26 +176,32 @@ def parse_game_log_file(log_file) -> dict:
     p1_name = log_file.readline().split(" - ")[0]
     p2_name = log_file.readline().split(" - ")[0]
     player_names = [p1_name, p2_name]
+    seat_players = None
+    renames = {}
+    if pair is not None and pair["swapped"]:
+        seat_players = [
+            SEAT_PREFIX_PATTERN.sub(f"Ai({2 - k})-", name)
+            for k, name in enumerate(player_names)
+        ]
+        renames = dict(zip(player_names, seat_players))
+        player_names = seat_players[::-1]
 
-    out = {
-        "turns": defaultdict(dict),
-        "players": player_names,
-        "winner": "NONE",
-    }
+    out = Game(player_names)
+    out.pair = pair
 
     import traceback
 
     def handle_event_block(event: str, data: str):
         match event:
             case "forge.game.event.GameEventTurnPhase":
-                if ("Main phase, precombat phase" in data
-                        or "Cleanup step phase"
-                        in data) and "Board state" in data:
+                if is_kept_turn_phase(data):
                     try:
-                        game_state = parse_game_state(
-                            data, player_names_in_order=player_names)
-                        out["turns"][game_state["turn"]][
-                            game_state["activephase"]] = game_state
+                        with PROFILER.span("parse_game_state", trace=False):
+                            game_state = parse_game_state(
+                                data, out, seat_players)
+                        out.turns.setdefault(
+                            game_state.turn,
+                            {})[game_state.activephase] = game_state
                     except Exception as e:
                         print("Error parsing block:")
                         print(data)
@@ -136,7 +211,7 @@ def parse_game_log_file(log_file) -> dict:
                             7] == "result=", f"Malformed result block data {data}"
                 winners = re.findall(r"(.+) has won", data[7:])
                 if len(winners) == 1:
-                    out["winner"] = winners[0]
+                    out.winner = renames.get(winners[0], winners[0])
                 else:
                     print(
                         f"Warning: Expected exactly one winner, found {len(winners)}: {winners}"
@@ -144,7 +219,7 @@ def parse_game_log_file(log_file) -> dict:
                 # Figure out loss reason
                 loss_reason = re.findall(r"has lost (.+)", data[7:])
                 if len(loss_reason) == 1:
-                    out["loss_reason"] = loss_reason[0]
+                    out.loss_reason = loss_reason[0]
                 else:
                     print(
                         f"Warning: Expected exactly one loss reason, found {loss_reason}"
@@ -155,7 +230,7 @@ def parse_game_log_file(log_file) -> dict:
 
     for line in log_file:
         line = line.rstrip('\n')
-        match = re.match(r"== GameEvent: (.+) ===", line)
+        match = EVENT_HEADER.match(line)
         if match:
             if current_event:
                 handle_event_block(current_event, "\n".join(current_block))
@@ -170,20 +245,98 @@ def parse_game_log_file(log_file) -> dict:
     return out
 
 
-def main():
+def prune_game_log(in_file, out_file):
+    '''
+        Copies a game log, keeping only the player header and the event blocks
+        `parse_game_log_file` uses. The copy parses to exactly the same game.
+    '''
+    for _ in range(3):
+        out_file.write(in_file.readline())
+
+    current_event = None
+    current_block = []
+
+    def flush():
+        if current_event and is_needed_event(
+                current_event,
+                "\n".join(line.rstrip('\n') for line in current_block[1:])):
+            out_file.writelines(current_block)
+
+    for line in in_file:
+        match = EVENT_HEADER.match(line.rstrip('\n'))
+        if match:
+            flush()
+            current_event = match.group(1)
+            current_block = [line]
+        elif current_event:
+            current_block.append(line)
+    flush()
+
+
+def prune_game_log_file(log_path):
+    '''
+        Prunes a game log in place. Returns its size before and after.
+    '''
+    tmp_path = log_path + ".tmp"
+    with open(log_path, "r") as in_file, open(tmp_path, "w") as out_file:
+        prune_game_log(in_file, out_file)
+    size_before = os.path.getsize(log_path)
+    os.replace(tmp_path, log_path)
+    return size_before, os.path.getsize(log_path)
+
+
+def write_data_json(all_data: dict, f, index: dict = None):
+    '''
+        Writes the same text as `json.dump(all_data, f, indent=2)` would for
+        the games as dicts, but expands only one game at a time. If `index` is
+        given, each game's byte range in the file and its outcome are recorded
+        in it.
+    '''
+    if not all_data:
+        f.write("{}")
+        return
+    f.write("{")
+    for k, (game_id, game) in enumerate(all_data.items()):
+        game_json = json.dumps(game.to_dict(), indent=2).replace("\n", "\n  ")
+        f.write(("," if k else "") + f"\n  {json.dumps(game_id)}: ")
+        if index is not None:
+            start = f.tell()
+        f.write(game_json)
+        if index is not None:
+            index[game_id] = {
+                "offset": start,
+                "length": f.tell() - start,
+                "winner": game.winner,
+                "loss_reason": game.loss_reason,
+            }
+    f.write("\n}")
+
+
+def main(argv=None):
     import argparse
     parser = argparse.ArgumentParser(
         description="Process log files into structured stats.")
     parser.add_argument("experiment_dir", help="Experiment directory.")
-    args = parser.parse_args()
+    parser.add_argument("--profile",
+                        action="store_true",
+                        help="Record per-stage timings to profile_process.*")
+    parser.add_argument("--prune-logs",
+                        action="store_true",
+                        help="Strip the logs down to the events this parser "
+                        "uses, in place, before parsing them")
+    args = parser.parse_args(argv)
+    if args.profile:
+        PROFILER.enable()
 
     # Open info.json
     with open(os.path.join(args.experiment_dir, "info.json"), "r") as f:
         info_dict = json.load(f)
 
     output_file = os.path.join(args.experiment_dir, "data.json")
-    if os.path.exists(output_file):
-        os.remove(output_file)
+    index_file = os.path.join(args.experiment_dir, DATA_INDEX_NAME)
+    for path in (output_file, index_file):
+        if os.path.exists(path):
+            os.remove(path)
 
     logs_dir = os.path.join(args.experiment_dir, "logs")
 
@@ -192,13 +345,33 @@ def main():
     for log_k, log_subpath in enumerate(logs_to_read):
         log_path = os.path.join(logs_dir, log_subpath)
         print("Parsing ", log_path)
+        if args.prune_logs:
+            with PROFILER.span("prune log", cat="io", log=log_subpath):
+                prune_game_log_file(log_path)
 
-        with open(log_path, "r") as f:
-            all_data[f"game_{log_k:03d}"] = parse_game_log_file(f)
+        if PROFILER.enabled:
+            # Read the whole file first so I/O and parsing are timed apart.
+            with PROFILER.span("read log", cat="io", log=log_subpath):
+                with open(log_path, "r") as f:
+                    log_text = f.read()
+            with PROFILER.span("parse_game_log_file", cat="parse",
+                               log=log_subpath):
+                all_data[f"game_{log_k:03d}"] = parse_game_log_file(
+                    io.StringIO(log_text), pair=get_pair_info(log_path))
+        else:
+            with open(log_path, "r") as f:
+                all_data[f"game_{log_k:03d}"] = parse_game_log_file(
+                    f, pair=get_pair_info(log_path))
 
-    with open(output_file, "w") as f:
-        json.dump(all_data, f, indent=2)
+    data_index = {}
+    with PROFILER.span("json.dump", cat="io"):
+        with open(output_file, "w") as f:
+            write_data_json(all_data, f, index=data_index)
+    with open(index_file, "w") as f:
+        json.dump(data_index, f)
     print(f"Saved data to {output_file}")
+    PROFILER.write(os.path.join(args.experiment_dir, "profile_process"))
+    PROFILER.reset()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,134 @@
+'''
+    Opt-in timing of pipeline stages.
+
+    Code marks stages with `with PROFILER.span("name", cat="stage", key=value):`.
+    While the profiler is disabled (the default) `span` returns a shared no-op
+    context manager, so instrumented code pays a single attribute check.
+
+    Once enabled with `--profile`, every span becomes a Chrome trace event
+    (load the `.trace.json` in chrome://tracing or https://ui.perfetto.dev)
+    and is tallied into a per-name summary table. Spans created with
+    `trace=False` are only tallied, for hot spots that run too often to be
+    worth an event each.
+'''
+import os
+import json
+import time
+import threading
+import contextlib
+from collections import defaultdict
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "cat", "args", "trace", "start")
+
+    def __init__(self, profiler, name, cat, args, trace):
+        self.profiler = profiler
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_span(self.name,
+                               self.start,
+                               time.perf_counter(),
+                               cat=self.cat,
+                               trace=self.trace,
+                               **self.args)
+        return False
+
+
+class Profiler:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+        self.origin = time.perf_counter()
+
+    def reset(self):
+        '''
+            Disables the profiler and drops everything recorded, so a stage
+            run in the same process afterwards starts from scratch.
+        '''
+        with self.lock:
+            self.enabled = False
+            self.origin = time.perf_counter()
+            self.events = []
+            # name -> [count, total seconds, max seconds]
+            self.totals = defaultdict(lambda: [0, 0., 0.])
+
+    def span(self, name, cat="", trace=True, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args, trace)
+
+    def add_span(self, name, start, end, cat="", trace=True, **args):
+        '''
+            Records a span measured elsewhere, with `time.perf_counter()`
+            timestamps (e.g. a game inferred from when its log appeared).
+        '''
+        if not self.enabled:
+            return
+        duration = end - start
+        with self.lock:
+            total = self.totals[name]
+            total[0] += 1
+            total[1] += duration
+            total[2] = max(total[2], duration)
+            if trace:
+                self.events.append({
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": (start - self.origin) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args,
+                })
+
+    def summary(self) -> str:
+        wall = time.perf_counter() - self.origin
+        rows = sorted(self.totals.items(), key=lambda item: -item[1][1])
+        width = max([len("stage")] + [len(name) for name, _ in rows])
+        lines = [
+            f"{'stage':<{width}}  {'count':>8}  {'total s':>10}  "
+            f"{'mean ms':>10}  {'max ms':>10}  {'% wall':>7}"
+        ]
+        for name, (count, total, longest) in rows:
+            lines.append(f"{name:<{width}}  {count:>8}  {total:>10.3f}  "
+                         f"{1e3 * total / count:>10.2f}  {1e3 * longest:>10.2f}"
+                         f"  {100. * total / wall:>6.1f}%")
+        lines.append(f"Wall time: {wall:0.3f} s")
+        return "\n".join(lines)
+
+    def write(self, path_prefix):
+        '''
+            Writes `<path_prefix>.trace.json` and `<path_prefix>.txt`, and
+            prints the summary.
+        '''
+        if not self.enabled:
+            return
+        summary = self.summary()
+        with self.lock:
+            trace = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+        with open(path_prefix + ".trace.json", "w") as f:
+            json.dump(trace, f)
+        with open(path_prefix + ".txt", "w") as f:
+            f.write(summary + "\n")
+        print(summary)
+        print(f"Saved profile to {path_prefix}.trace.json and "
+              f"{path_prefix}.txt")
+
+
+PROFILER = Profiler()
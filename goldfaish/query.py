@@ -0,0 +1,281 @@
+'''
+    Indexed queries over an experiment's parsed games.
+
+    The first query against an experiment parses `data.json` once and caches a
+    `GameIndex` next to it: the full feature table, plus inverted indexes from
+    winner, loss reason, game length, (phase, player, turn) and card name to
+    the games or rows they occur in. Every filter then works on those indexes
+    and numpy masks instead of re-scanning the games.
+
+        python -m goldfaish.query <experiment dir> --where 0 3 hand_lands == 0
+        python -m goldfaish.query <experiment dir> --loss-reason "commander damage"
+
+    Turn numbers are Forge's, where each player's turn counts separately.
+'''
+import argparse
+import dataclasses
+import operator
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from goldfaish.dataset import load_cached
+from goldfaish.features import (FEATURES_VERSION, PLAYER_FEATURES,
+                                FeatureTable, extract_features)
+
+INDEX_CACHE_NAME = "query_index.pkl"
+# Bump whenever the index layout changes; also tracks the feature extractor.
+INDEX_VERSION = (1, FEATURES_VERSION)
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+@dataclasses.dataclass
+class GameIndex:
+    table: FeatureTable
+    # Value -> sorted array of game indices.
+    by_winner: dict
+    by_loss_reason: dict
+    # (phase, player) -> turn -> array of row indices into table.rows.
+    by_turn: dict
+    # (lowercased card name, player) -> sorted array of game indices in which
+    # that player had the card in hand or on the battlefield.
+    by_card: dict
+
+
+def group_indices(keys) -> dict:
+    groups = defaultdict(list)
+    for i, key in enumerate(keys):
+        groups[key].append(i)
+    return {key: np.array(value, dtype=np.int32) for key, value in groups.items()}
+
+
+def build_index(data: dict) -> GameIndex:
+    table = extract_features(data)
+
+    by_turn = {}
+    for key, columns in table.rows.items():
+        by_turn[key] = group_indices(columns["turn"].tolist())
+
+    cards = defaultdict(set)
+    for game_index, game in enumerate(data.values()):
+        for phases in game["turns"].values():
+            for state in phases.values():
+                for player in table.players:
+                    player_state = state[player]
+                    for zone in ("hand", "battlefield"):
+                        for card in player_state.get(zone, []):
+                            if card["name"]:
+                                cards[(card["name"].lower(),
+                                       player)].add(game_index)
+
+    return GameIndex(
+        table=table,
+        by_winner=group_indices(
+            table.players[w] if w >= 0 else "NONE"
+            for w in table.winners),
+        by_loss_reason=group_indices(table.loss_reasons),
+        by_turn=by_turn,
+        by_card={
+            key: np.array(sorted(games), dtype=np.int32)
+            for key, games in cards.items()
+        },
+    )
+
+
+def load_index(experiment_dir, rebuild=False) -> GameIndex:
+    return load_cached(experiment_dir,
+                       INDEX_CACHE_NAME,
+                       INDEX_VERSION,
+                       build_index,
+                       rebuild=rebuild)
+
+
+class GameQuery:
+    '''
+        An immutable selection of games. Each filter returns a new, narrower
+        query, so filters can be chained:
+
+            GameQuery(index).winner("Ai(1)-Deck").where(1, 3, "hand_lands", "==", 0)
+    '''
+
+    def __init__(self, index: GameIndex, mask=None):
+        self.index = index
+        if mask is None:
+            mask = np.ones(index.table.num_games, dtype=bool)
+        self.mask = mask
+
+    def resolve_player(self, player) -> str:
+        # Accepts a full player name, a seat index or a unique substring.
+        players = self.index.table.players
+        if player in players:
+            return player
+        if str(player).isdigit() and int(player) < len(players):
+            return players[int(player)]
+        matches = [p for p in players if str(player).lower() in p.lower()]
+        assert len(matches) == 1, f"Can't resolve player {player} among {players}"
+        return matches[0]
+
+    def _narrow(self, game_indices) -> "GameQuery":
+        selected = np.zeros_like(self.mask)
+        selected[game_indices] = True
+        return GameQuery(self.index, self.mask & selected)
+
+    def _narrow_by(self, index: dict, keys) -> "GameQuery":
+        games = [index[key] for key in keys if key in index]
+        if not games:
+            return GameQuery(self.index, np.zeros_like(self.mask))
+        return self._narrow(np.concatenate(games))
+
+    def winner(self, player) -> "GameQuery":
+        return self._narrow_by(self.index.by_winner,
+                               [self.resolve_player(player)])
+
+    def loser(self, player) -> "GameQuery":
+        player = self.resolve_player(player)
+        return self._narrow_by(self.index.by_winner, [
+            p for p in self.index.table.players if p != player
+        ])
+
+    def loss_reason(self, text) -> "GameQuery":
+        # Case-insensitive substring match against the recorded loss reasons.
+        return self._narrow_by(self.index.by_loss_reason, [
+            reason for reason in self.index.by_loss_reason
+            if text.lower() in reason.lower()
+        ])
+
+    def num_turns(self, min_turns=None, max_turns=None) -> "GameQuery":
+        num_turns = self.index.table.num_turns
+        mask = self.mask.copy()
+        if min_turns is not None:
+            mask &= num_turns >= min_turns
+        if max_turns is not None:
+            mask &= num_turns <= max_turns
+        return GameQuery(self.index, mask)
+
+    def has_card(self, name, player=None) -> "GameQuery":
+        players = self.index.table.players
+        if player is not None:
+            players = [self.resolve_player(player)]
+        return self._narrow_by(self.index.by_card,
+                               [(name.lower(), p) for p in players])
+
+    def where(self, player, turn, feature, op, value,
+              phase="MAIN1") -> "GameQuery":
+        '''
+            Keeps games in which `feature` of `player` at `phase` of `turn`
+            satisfies `op` against `value`. Games that never reached that turn
+            and phase are dropped.
+        '''
+        assert feature in PLAYER_FEATURES, f"Unknown feature {feature}"
+        player = self.resolve_player(player)
+        columns = self.index.table.rows.get((phase, player))
+        rows = self.index.by_turn.get((phase, player), {}).get(int(turn))
+        if columns is None or rows is None:
+            return GameQuery(self.index, np.zeros_like(self.mask))
+        passed = OPERATORS[op](columns[feature][rows], value)
+        return self._narrow(columns["game"][rows][passed])
+
+    def game_indices(self) -> np.ndarray:
+        return np.flatnonzero(self.mask)
+
+    def game_ids(self) -> list:
+        return [self.index.table.game_ids[i] for i in self.game_indices()]
+
+    def summary(self) -> dict:
+        table = self.index.table
+        selected = self.game_indices()
+        wins = Counter(table.players[w] if w >= 0 else "NONE"
+                       for w in table.winners[selected])
+        return {
+            "matched": len(selected),
+            "total": table.num_games,
+            "wins": dict(wins),
+            "loss_reasons": dict(
+                Counter(table.loss_reasons[i] for i in selected)),
+            "mean_turns": float(np.mean(table.num_turns[selected]))
+            if len(selected) else float("nan"),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find games matching a set of filters.")
+    parser.add_argument("experiment_dir", help="Experiment directory.")
+    parser.add_argument("--winner", help="Player who won.")
+    parser.add_argument("--loser", help="Player who lost.")
+    parser.add_argument("--loss-reason",
+                        help="Substring of the recorded loss reason.")
+    parser.add_argument("--min-turns",
+                        type=int,
+                        help="Minimum game length, in Forge turns.")
+    parser.add_argument("--max-turns",
+                        type=int,
+                        help="Maximum game length, in Forge turns.")
+    parser.add_argument("--card",
+                        action="append",
+                        default=[],
+                        help="Card seen in hand or on the battlefield.")
+    parser.add_argument("--card-player",
+                        help="Only match --card for this player.")
+    parser.add_argument(
+        "--where",
+        nargs=5,
+        action="append",
+        default=[],
+        metavar=("PLAYER", "TURN", "FEATURE", "OP", "VALUE"),
+        help=f"Per-turn condition, e.g. `0 3 hand_lands == 0`. Features: "
+        f"{', '.join(PLAYER_FEATURES)}.")
+    parser.add_argument("--phase",
+                        default="MAIN1",
+                        help="Phase --where conditions are checked at.")
+    parser.add_argument("--limit",
+                        type=int,
+                        default=50,
+                        help="Maximum number of game IDs to print.")
+    parser.add_argument("--rebuild",
+                        action="store_true",
+                        help="Rebuild the index even if it is up to date.")
+    args = parser.parse_args(argv)
+
+    query = GameQuery(load_index(args.experiment_dir, rebuild=args.rebuild))
+    if args.winner:
+        query = query.winner(args.winner)
+    if args.loser:
+        query = query.loser(args.loser)
+    if args.loss_reason:
+        query = query.loss_reason(args.loss_reason)
+    if args.min_turns is not None or args.max_turns is not None:
+        query = query.num_turns(args.min_turns, args.max_turns)
+    for card in args.card:
+        query = query.has_card(card, args.card_player)
+    for player, turn, feature, op, value in args.where:
+        assert op in OPERATORS, f"Unknown operator {op}"
+        query = query.where(player, int(turn), feature, op, int(value),
+                            phase=args.phase)
+
+    game_ids = query.game_ids()
+    for game_id in game_ids[:args.limit]:
+        print(game_id)
+    if len(game_ids) > args.limit:
+        print(f"... and {len(game_ids) - args.limit} more")
+
+    summary = query.summary()
+    print(f"\nMatched {summary['matched']} of {summary['total']} games, "
+          f"mean length {summary['mean_turns']:0.2f} Forge turns.")
+    for player, wins in sorted(summary["wins"].items()):
+        print(f"  {player} won {wins} ({wins / summary['matched']:0.1%})")
+    for reason, count in sorted(summary["loss_reasons"].items(),
+                                key=lambda item: -item[1]):
+        print(f"  lost {reason}: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,253 @@
+'''
+    Brings every experiment in a directory up to date, make-style.
+
+    Each stage re-runs only when one of its inputs changed since it last
+    succeeded:
+      - collect: the simulation settings in `info.json` (decks, format,
+        Forge args, pairing, seed option) and the contents of the decks.
+      - process: the set of game logs (paths, sizes, mtimes) and
+        `process_logs.PARSER_VERSION`.
+      - plot: `data.json`, `telemetry.json` and `plot_stats.REPORT_VERSION`.
+    A missing input counts as changed. Collect and process are only recorded
+    as done once the experiment has game logs. Collecting again after the
+    settings or decks changed takes hours of Forge time, so it only happens
+    with `--recollect_data`; the old logs and telemetry then move to
+    `logs_stale_<timestamp>`. Without it, a warning names what changed.
+    The inputs each stage last ran with are recorded in the experiment's
+    `pipeline_state.json`. Experiments are independent, so with `--parallel N`
+    up to N of them are updated at once, each in its own process.
+'''
 import argparse
+import datetime
+import glob
+import hashlib
+import importlib
+import json
 import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-if __name__ == "__main__":
+PIPELINE_STATE_NAME = "pipeline_state.json"
+
+
+# The info.json fields collect_data reads, with the value it assumes when one
+# is missing. Any other field (notes, "unused", ...) doesn't affect the games.
+SIMULATION_FIELDS = {
+    "deck_a": None,
+    "deck_b": None,
+    "format": None,
+    "forge_args": [],
+    "paired": False,
+    "seed_arg": None,
+}
+
+
+def canonical_deck(path) -> dict:
+    '''
+        A deck file's sections as sorted lists of their non-blank lines, so
+        whitespace, line endings and card order don't count as edits.
+    '''
+    sections = {}
+    section = None
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("["):
+                section = line.lower()
+                sections.setdefault(section, [])
+            else:
+                sections.setdefault(section, []).append(line)
+    return {str(k): sorted(v) for k, v in sections.items()}
+
+
+def stat_fingerprint(paths, root) -> str:
+    # Cheap stand-in for hashing large files: a digest of each file's relative
+    # path, size and mtime. One string however many logs there are.
+    sha = hashlib.sha256()
+    for path in sorted(paths):
+        stat = os.stat(path)
+        sha.update(
+            f"{os.path.relpath(path, root)}\0{stat.st_size}\0"
+            f"{stat.st_mtime_ns}\n".encode("utf-8"))
+    return sha.hexdigest()
+
+
+def collect_inputs(experiment_dir):
+    '''
+        The simulation settings from `info.json` plus a digest of the decks'
+        contents, or None if a deck is missing, which makes collect stale
+        (and lets it report the missing deck).
+    '''
+    with open(os.path.join(experiment_dir, "info.json"), "r") as f:
+        info_dict = json.load(f)
+    inputs = {
+        key: info_dict.get(key, default)
+        for key, default in SIMULATION_FIELDS.items()
+    }
+    sha = hashlib.sha256()
+    for key in ("deck_a", "deck_b"):
+        deck_path = os.path.join(experiment_dir, "decks", str(inputs[key]))
+        if not os.path.exists(deck_path):
+            return None
+        sha.update(
+            json.dumps(canonical_deck(deck_path),
+                       sort_keys=True).encode("utf-8"))
+    inputs["decks"] = sha.hexdigest()
+    return inputs
+
+
+def changed_fields(old, new) -> list:
+    return sorted(key for key in new if old.get(key) != new.get(key))
+
+
+def move_aside_stale_logs(experiment_dir):
+    '''
+        Moves `logs` to `logs_stale_<timestamp>`, along with the telemetry of
+        the runs that produced them, so neither mixes with a fresh collect.
+    '''
+    from goldfaish.telemetry import TELEMETRY_NAME
+    logs_dir = os.path.join(experiment_dir, "logs")
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    stale_dir = f"{logs_dir}_stale_{timestamp}"
+    os.rename(logs_dir, stale_dir)
+    telemetry_path = os.path.join(experiment_dir, TELEMETRY_NAME)
+    if os.path.exists(telemetry_path):
+        os.rename(telemetry_path, os.path.join(stale_dir, TELEMETRY_NAME))
+    print(f"{experiment_dir}: moved the old logs to {stale_dir}")
+
+
+def list_logs(experiment_dir) -> list:
+    logs_dir = os.path.join(experiment_dir, "logs")
+    return [
+        os.path.join(logs_dir, log_subpath)
+        for log_subpath in glob.glob("**/*.log", root_dir=logs_dir)
+    ]
+
+
+def process_inputs(experiment_dir):
+    from goldfaish.process_logs import PARSER_VERSION
+    return {
+        "parser_version": PARSER_VERSION,
+        "logs": stat_fingerprint(list_logs(experiment_dir), experiment_dir),
+    }
+
+
+def plot_inputs(experiment_dir):
+    from goldfaish.features import FEATURES_VERSION
+    from goldfaish.plot_stats import REPORT_VERSION
+    from goldfaish.telemetry import TELEMETRY_NAME
+    inputs = [
+        os.path.join(experiment_dir, name)
+        for name in ("data.json", TELEMETRY_NAME)
+    ]
+    return {
+        "report_version": [REPORT_VERSION, FEATURES_VERSION],
+        "data": stat_fingerprint(
+            [path for path in inputs if os.path.exists(path)], experiment_dir),
+    }
+
+
+def load_state(experiment_dir) -> dict:
+    state_path = os.path.join(experiment_dir, PIPELINE_STATE_NAME)
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, "r") as f:
+        return json.load(f)
+
+
+def save_state(experiment_dir, state: dict):
+    with open(os.path.join(experiment_dir, PIPELINE_STATE_NAME), "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def run_stage(module_name, argv):
+    '''
+        Runs a stage's `main` in this process. Afterwards, also if it fails,
+        drops the process-wide state it leaves behind (profiler events, string
+        pools, open matplotlib figures), so the next stage or experiment starts
+        clean.
+    '''
+    from goldfaish import game_model
+    from goldfaish.profiling import PROFILER
+    try:
+        importlib.import_module(module_name).main(argv)
+    finally:
+        PROFILER.reset()
+        game_model.reset_pools()
+        if "matplotlib.pyplot" in sys.modules:
+            sys.modules["matplotlib.pyplot"].close("all")
+
+
+def update_experiment(experiment_dir, games, jobs, recollect_data=False,
+                      dry_run=False) -> list:
+    '''
+        Re-runs the stale stages of one experiment, in order, and returns the
+        names of the stages that ran (or would run, for a dry run).
+    '''
+    state = load_state(experiment_dir)
+    ran = []
+
+    inputs = collect_inputs(experiment_dir)
+    has_logs = len(list_logs(experiment_dir)) > 0
+    if has_logs and inputs is not None and not isinstance(
+            state.get("collect"), dict):
+        # Logs from before staleness tracking, or from when it hashed the raw
+        # files; assume they match the decks.
+        state["collect"] = inputs
+    inputs_changed = inputs is not None and state.get("collect") != inputs
+    if has_logs and inputs_changed and not recollect_data:
+        # Re-collecting can take hours of Forge time, so only on request.
+        print(f"{experiment_dir}: WARNING: "
+              f"{', '.join(changed_fields(state['collect'], inputs))} "
+              "changed since the logs were collected. Keeping the old logs; "
+              "run with --recollect_data to move them aside and collect "
+              "again.")
+    elif recollect_data or not has_logs or inputs is None or inputs_changed:
+        ran.append("collect")
+        if not dry_run:
+            if has_logs and inputs_changed:
+                # The decks or settings changed, so the old games no longer
+                # describe this matchup. Keep them, but out of `logs`.
+                move_aside_stale_logs(experiment_dir)
+            run_stage("goldfaish.collect_data", [
+                experiment_dir, "--games",
+                str(games), "--jobs",
+                str(jobs)
+            ])
+            if not list_logs(experiment_dir):
+                # Processing nothing would only produce an empty data.json.
+                print(f"{experiment_dir}: collect produced no game logs, "
+                      "skipping process and plot")
+                return ran
+            state["collect"] = inputs
+            save_state(experiment_dir, state)
+
+    data_json = os.path.join(experiment_dir, "data.json")
+    inputs = process_inputs(experiment_dir)
+    if "collect" in ran or not os.path.exists(data_json) or state.get(
+            "process") != inputs:
+        ran.append("process")
+        if not dry_run:
+            run_stage("goldfaish.process_logs", [experiment_dir])
+            if list_logs(experiment_dir):
+                state["process"] = process_inputs(experiment_dir)
+                save_state(experiment_dir, state)
+
+    index_html = os.path.join(experiment_dir, "index.html")
+    if "process" in ran or not os.path.exists(index_html) or state.get(
+            "plot") != plot_inputs(experiment_dir):
+        ran.append("plot")
+        if not dry_run:
+            run_stage("goldfaish.plot_stats", [experiment_dir])
+            state["plot"] = plot_inputs(experiment_dir)
+            save_state(experiment_dir, state)
+    return ran
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "experiment_dir",
@@ -15,17 +261,55 @@ if __name__ == "__main__":
                         default=3,
                         help="Number of parallel jobs")
     parser.add_argument("--recollect_data",
-                        action="store_true")
-    args = parser.parse_args()
+                        action="store_true",
+                        help="Collect more games even if nothing changed, and "
+                        "collect again after the decks or settings changed")
+    parser.add_argument("--parallel",
+                        type=int,
+                        default=1,
+                        help="Number of experiments to update at once")
+    parser.add_argument("--dry-run",
+                        action="store_true",
+                        help="Only print which stages are stale")
+    args = parser.parse_args(argv)
 
-    for subdir in os.listdir(args.experiment_dir):
+    experiment_dirs = []
+    for subdir in sorted(os.listdir(args.experiment_dir)):
         full_subdir = os.path.join(args.experiment_dir, subdir)
         if not os.path.isdir(full_subdir):
             continue
         if os.path.exists(os.path.join(full_subdir, "info.json")):
-            print(f"Updating {full_subdir}")
-            if not os.path.exists(os.path.join(full_subdir, "data.json")) or args.recollect_data:
-                os.system(f"python -m goldfaish.collect_data {full_subdir} --games {args.games} --jobs {args.jobs}")
-            os.system(f"python -m goldfaish.process_logs {full_subdir}")
-            os.system(f"python -m goldfaish.plot_stats {full_subdir}")
-            
+            experiment_dirs.append(full_subdir)
+
+    task_args = (args.games, args.jobs, args.recollect_data, args.dry_run)
+    verb = "would run" if args.dry_run else "ran"
+    if args.parallel <= 1:
+        # All stages run in this process; each is only imported once needed.
+        for experiment_dir in experiment_dirs:
+            print(f"Updating {experiment_dir}")
+            try:
+                ran = update_experiment(experiment_dir, *task_args)
+                print(f"{experiment_dir}: {verb} {', '.join(ran) or 'nothing, up to date'}")
+            except Exception:
+                print(f"{experiment_dir}: failed")
+                traceback.print_exc()
+        return
+
+    with ProcessPoolExecutor(max_workers=args.parallel) as executor:
+        futures = {
+            executor.submit(update_experiment, experiment_dir, *task_args):
+            experiment_dir
+            for experiment_dir in experiment_dirs
+        }
+        for future in as_completed(futures):
+            experiment_dir = futures[future]
+            try:
+                ran = future.result()
+                print(f"{experiment_dir}: {verb} {', '.join(ran) or 'nothing, up to date'}")
+            except Exception:
+                print(f"{experiment_dir}: failed")
+                traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+'''
+    Warm-start cache for the Forge JVM.
+
+    Every `collect_data` job boots a fresh JVM and loads Forge's classes and
+    card database before the first game. An AppCDS archive (JDK 13+) lets the
+    JVM map the already-parsed classes of a previous run instead. The archive
+    is recorded once per Forge jar by a short training run (a single game
+    with the experiment's own decks, so the card-loading code paths are
+    covered), stored next to the jar, and regenerated whenever the jar
+    changes. Concurrent `collect_data` processes may share the cache: each
+    builds into its own temporary file and moves it into place atomically, so
+    no job ever maps a half-written archive.
+'''
+import os
+import re
+import json
+import shlex
+import subprocess
+import tempfile
+import time
+import uuid
+
+CACHE_DIR_NAME = ".goldfaish_cds"
+CACHE_INFO_NAME = "cache_info.json"
+JAR_PATTERN = re.compile(r'-jar\s+"?([^"\s]+\.jar)"?')
+JAVA_PATTERN = re.compile(r'^\s*("?[^"\s]*java(?:\.exe)?"?)\s')
+
+
+def split_command(cmd: str):
+    '''
+        Windows takes the command line as one string; elsewhere it is run
+        without a shell, so split it into arguments.
+    '''
+    return cmd if os.name == "nt" else shlex.split(cmd)
+
+
+def find_forge_jar(forge_cmd, forge_bin_dir):
+    match = JAR_PATTERN.search(forge_cmd)
+    if match is None:
+        return None
+    return os.path.join(forge_bin_dir, match.group(1))
+
+
+def with_jvm_flags(forge_cmd, jvm_flags) -> str:
+    '''
+        Inserts `jvm_flags` right after the `java` executable of `forge_cmd`.
+    '''
+    if not jvm_flags:
+        return forge_cmd
+    flags = " ".join(f'"{flag}"' for flag in jvm_flags)
+    return JAVA_PATTERN.sub(lambda m: f"{m.group(1)} {flags} ", forge_cmd, 1)
+
+
+def jar_fingerprint(jar_path) -> dict:
+    stat = os.stat(jar_path)
+    return {
+        "jar": os.path.basename(jar_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def archive_path_for(cache_dir, fingerprint) -> str:
+    return os.path.join(
+        cache_dir,
+        f"{os.path.splitext(fingerprint['jar'])[0]}-{fingerprint['size']}-"
+        f"{fingerprint['mtime_ns']}.jsa")
+
+
+def run_training_job(forge_cmd, forge_bin_dir, archive_path, forge_args):
+    cmd_prefix = with_jvm_flags(forge_cmd,
+                                [f"-XX:ArchiveClassesAtExit={archive_path}"])
+    with tempfile.TemporaryDirectory() as log_dir:
+        cmd = " ".join([
+            cmd_prefix, "sim", "-n", "1", "-logDir", '"' + log_dir + '"',
+            *forge_args, "-q"
+        ])
+        print("Building startup cache: ", cmd)
+        start = time.time()
+        try:
+            proc = subprocess.run(split_command(cmd),
+                                  stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.STDOUT,
+                                  cwd=forge_bin_dir)
+        except OSError as e:
+            print(f"Startup cache training run failed to launch: {e}")
+            return False
+        print(f"Startup cache training run took {time.time() - start:0.1f}s")
+    return proc.returncode == 0 and os.path.exists(archive_path)
+
+
+def write_json_atomic(path, value):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(value, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_archive(forge_cmd, forge_bin_dir, archive_path, forge_args) -> bool:
+    '''
+        Records the archive under a name private to this call and then moves
+        it to `archive_path`. If several processes build at once, each move
+        replaces a complete archive with another complete one.
+    '''
+    tmp_path = f"{archive_path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        if not run_training_job(forge_cmd, forge_bin_dir, tmp_path,
+                                forge_args):
+            return False
+        os.replace(tmp_path, archive_path)
+        return True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def remove_stale_archives(cache_dir, archive_path):
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.endswith(".jsa") and path != archive_path:
+            try:
+                os.remove(path)
+            except OSError:
+                # Another job may have removed it already, or (on Windows)
+                # still have it mapped.
+                pass
+
+
+def get_startup_jvm_flags(forge_cmd, forge_bin_dir, forge_args) -> list:
+    '''
+        Returns the JVM flags that make Forge start from the cached archive,
+        building the archive first if it is missing or the jar changed. Returns
+        no flags if the cache can't be used, so jobs just start cold.
+    '''
+    if JAVA_PATTERN.match(forge_cmd) is None:
+        print("Startup cache: FORGE_CMD doesn't launch java, skipping.")
+        return []
+    jar_path = find_forge_jar(forge_cmd, forge_bin_dir)
+    if jar_path is None or not os.path.exists(jar_path):
+        print(f"Startup cache: can't find the Forge jar ({jar_path}), "
+              "skipping.")
+        return []
+
+    cache_dir = os.path.join(os.path.dirname(jar_path), CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    info_path = os.path.join(cache_dir, CACHE_INFO_NAME)
+    fingerprint = jar_fingerprint(jar_path)
+    archive_path = archive_path_for(cache_dir, fingerprint)
+
+    cached_fingerprint = None
+    if os.path.exists(info_path):
+        with open(info_path, "r") as f:
+            cached_fingerprint = json.load(f)
+    if cached_fingerprint != fingerprint or not os.path.exists(archive_path):
+        if cached_fingerprint is not None:
+            print("Startup cache is stale, the Forge jar changed.")
+        remove_stale_archives(cache_dir, archive_path)
+        if not build_archive(forge_cmd, forge_bin_dir, archive_path,
+                             forge_args):
+            print("Startup cache: training run failed (AppCDS needs JDK 13+), "
+                  "starting jobs cold.")
+            return []
+        write_json_atomic(info_path, fingerprint)
+
+    # -Xshare:auto quietly falls back to a cold start if the JVM rejects the
+    # archive, e.g. after a JDK upgrade.
+    return [f"-XX:SharedArchiveFile={archive_path}", "-Xshare:auto"]
@@ -0,0 +1,192 @@
+'''
+    Throughput telemetry for `collect_data` runs.
+
+    Each run records when every game finished (the mtime of its log; Forge
+    writes a game's log when the game ends) and started (when the job's
+    previous game finished, or when the job launched for its first game), and
+    samples CPU time and RSS of every job's Forge process. Runs are appended
+    to the experiment's `telemetry.json`, which `plot_stats` turns into a
+    throughput page.
+
+    While a run is going, games that take much longer than the median game so
+    far, and jobs that fall far behind the median job, are flagged as
+    stragglers.
+'''
+import os
+import json
+import threading
+import time
+import statistics
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+TELEMETRY_NAME = "telemetry.json"
+# Seconds between CPU/RSS samples of each Forge process.
+SAMPLE_SECONDS = 10.
+# A game is a straggler once it has run this many times the median game time,
+# and at least STRAGGLER_GAME_MIN_SECONDS (logs are only polled every second).
+STRAGGLER_GAME_FACTOR = 4.
+STRAGGLER_GAME_MIN_SECONDS = 10.
+# A job is a straggler when it has finished less than this fraction of the
+# games the median job has, once that is at least STRAGGLER_JOB_MIN_GAMES.
+STRAGGLER_JOB_FRACTION = 0.5
+STRAGGLER_JOB_MIN_GAMES = 5
+# Nothing is flagged before this many games have finished in the run.
+STRAGGLER_MIN_GAMES = 10
+
+
+def sample_process(pid):
+    '''
+        Returns (cumulative CPU seconds, RSS bytes) of a process and its
+        children, or None if it can't be read. Uses psutil when installed and
+        falls back to /proc (the process only) on Linux.
+    '''
+    try:
+        if psutil is not None:
+            proc = psutil.Process(pid)
+            procs = [proc] + proc.children(recursive=True)
+            cpu = rss = 0
+            for p in procs:
+                times = p.cpu_times()
+                cpu += times.user + times.system
+                rss += p.memory_info().rss
+            return cpu, rss
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # Fields after the parenthesized command name, which may contain
+            # spaces; utime and stime are fields 14 and 15, rss is 24.
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        cpu = (int(fields[11]) + int(fields[12])) / ticks
+        rss = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+        return cpu, rss
+    except Exception:
+        return None
+
+
+class RunTelemetry:
+    '''
+        Telemetry of one `collect_data` run. Jobs run in threads, so all
+        updates go through a lock.
+    '''
+
+    def __init__(self, timestamp, info=None):
+        self.lock = threading.Lock()
+        self.run = {
+            "timestamp": timestamp,
+            "start": time.time(),
+            "info": info or {},
+            "jobs": [],
+        }
+        self.flagged = set()
+
+    def start_job(self, name, games_requested, pid, start) -> dict:
+        job = {
+            "name": name,
+            "games_requested": games_requested,
+            "pid": pid,
+            "start": start,
+            "end": None,
+            "returncode": None,
+            "straggler": False,
+            "games": [],
+            # [time, cumulative CPU seconds, RSS bytes]
+            "samples": [],
+        }
+        with self.lock:
+            self.run["jobs"].append(job)
+        return job
+
+    def game_finished(self, job, log, finish):
+        with self.lock:
+            start = job["games"][-1]["finish"] if job["games"] else job["start"]
+            job["games"].append({
+                "log": log,
+                "start": start,
+                "finish": max(finish, start),
+                "includes_startup": not job["games"],
+                "straggler": (job["name"], len(job["games"])) in self.flagged,
+            })
+
+    def sample(self, job, now):
+        if job["samples"] and now - job["samples"][-1][0] < SAMPLE_SECONDS:
+            return
+        sample = sample_process(job["pid"])
+        if sample is not None:
+            with self.lock:
+                job["samples"].append([now, *sample])
+
+    def end_job(self, job, returncode):
+        with self.lock:
+            job["end"] = time.time()
+            job["returncode"] = returncode
+
+    def median_game_seconds(self):
+        # First games of a job include JVM startup and are left out.
+        durations = [
+            game["finish"] - game["start"] for job in self.run["jobs"]
+            for game in job["games"] if not game["includes_startup"]
+        ]
+        if len(durations) < STRAGGLER_MIN_GAMES:
+            return None
+        return statistics.median(durations)
+
+    def check_stragglers(self, now) -> list:
+        '''
+            Flags newly straggling games and jobs, and returns a message for
+            each. Everything is only reported once.
+        '''
+        messages = []
+        with self.lock:
+            median_game = self.median_game_seconds()
+            if median_game is None:
+                return messages
+            jobs = self.run["jobs"]
+            median_done = statistics.median(len(job["games"]) for job in jobs)
+            for job in jobs:
+                if job["end"] is not None:
+                    continue
+                num_done = len(job["games"])
+                if 0 < num_done < job["games_requested"]:
+                    elapsed = now - job["games"][-1]["finish"]
+                    key = (job["name"], num_done)
+                    if (key not in self.flagged and
+                            elapsed > STRAGGLER_GAME_MIN_SECONDS and
+                            elapsed > STRAGGLER_GAME_FACTOR * median_game):
+                        self.flagged.add(key)
+                        messages.append(
+                            f"Straggler: {job['name']} game {num_done + 1} "
+                            f"has run {elapsed:0.0f}s (median game "
+                            f"{median_game:0.1f}s)")
+                if (not job["straggler"] and
+                        median_done >= STRAGGLER_JOB_MIN_GAMES and
+                        num_done < STRAGGLER_JOB_FRACTION * median_done):
+                    job["straggler"] = True
+                    messages.append(
+                        f"Straggler: {job['name']} has finished {num_done} "
+                        f"games, the median job {median_done:g}")
+        return messages
+
+    def save(self, experiment_dir):
+        '''
+            Appends this run to the experiment's telemetry file.
+        '''
+        runs = load_telemetry(experiment_dir) or []
+        with self.lock:
+            self.run["end"] = time.time()
+            runs.append(self.run)
+        with open(os.path.join(experiment_dir, TELEMETRY_NAME), "w") as f:
+            json.dump({"runs": runs}, f)
+
+
+def load_telemetry(experiment_dir):
+    '''
+        Returns the list of recorded runs, or None if there is no telemetry.
+    '''
+    path = os.path.join(experiment_dir, TELEMETRY_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)["runs"]
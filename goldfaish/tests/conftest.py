@@ -0,0 +1,38 @@
+import json
+import os
+
+import pytest
+
+from goldfaish import fake_forge
+from goldfaish.load_test import make_experiment
+
+
+@pytest.fixture
+def experiment_dir(tmp_path):
+    """An experiment with the load test's decks and no games yet."""
+    experiment_dir = str(tmp_path / "experiment")
+    make_experiment(experiment_dir)
+    return experiment_dir
+
+
+@pytest.fixture
+def fake_forge_job(experiment_dir):
+    """Runs `fake_forge` like one `collect_data` job, into logs/<job_name>."""
+
+    def run(job_name, games, *fake_forge_args, seed=0, swapped=False):
+        with open(os.path.join(experiment_dir, "info.json"), "r") as f:
+            info = json.load(f)
+        decks = [info["deck_a"], info["deck_b"]]
+        if swapped:
+            decks = decks[::-1]
+        job_dir = os.path.join(experiment_dir, "logs", job_name)
+        os.makedirs(job_dir)
+        fake_forge.main([
+            *fake_forge_args, "--seed",
+            str(seed), "sim", "-n",
+            str(games), "-logDir", job_dir, "-d", *decks, "-D",
+            os.path.join(experiment_dir, "decks"), "-f", info["format"], "-q"
+        ])
+        return job_dir
+
+    return run
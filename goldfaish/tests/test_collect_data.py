@@ -0,0 +1,12 @@
+import os
+
+import pytest
+
+from goldfaish import collect_data
+
+
+def test_paired_needs_an_even_number_of_jobs(experiment_dir, capsys):
+    with pytest.raises(SystemExit):
+        collect_data.main([experiment_dir, "--paired", "--jobs", "3"])
+    assert "--paired requires an even --jobs" in capsys.readouterr().err
+    assert not os.path.exists(os.path.join(experiment_dir, "logs"))
@@ -0,0 +1,45 @@
+import json
+import os
+from collections import Counter
+
+from goldfaish import process_logs
+from goldfaish.dataset import load_data, load_data_sample, stratified_sample
+
+
+def test_stratified_sample_is_proportional():
+    strata = {f"game_{k}": "a" if k < 60 else "b" if k < 90 else "c"
+              for k in range(100)}
+    sample = stratified_sample(strata, 10, seed=1)
+    assert Counter(strata[key] for key in sample) == {"a": 6, "b": 3, "c": 1}
+    # Keys keep their original order.
+    assert sample == sorted(sample, key=list(strata).index)
+    assert stratified_sample(strata, 10, seed=1) == sample
+
+
+def test_stratified_sample_gives_remainders_to_largest_fractions():
+    strata = {f"game_{k}": "a" if k < 60 else "b" if k < 90 else "c"
+              for k in range(100)}
+    # Quotas 4.2, 2.1 and 0.7: the one game left over goes to "c".
+    sample = stratified_sample(strata, 7)
+    assert Counter(strata[key] for key in sample) == {"a": 4, "b": 2, "c": 1}
+    assert stratified_sample(strata, 200) == list(strata)
+
+
+def test_data_index_round_trips_through_load_data_sample(
+        fake_forge_job, experiment_dir):
+    fake_forge_job("job_0", 12, "--draw-rate", "0.2")
+    process_logs.main([experiment_dir])
+    with open(os.path.join(experiment_dir, "data.json"), "r") as f:
+        data = json.load(f)
+
+    sample, total_games = load_data_sample(experiment_dir, 5, seed=3)
+    assert total_games == 12
+    assert len(sample) == 5
+    for game_id, game in sample.items():
+        assert json.loads(json.dumps(game.to_dict())) == data[game_id]
+
+    games = load_data(experiment_dir)
+    assert list(games) == list(data)
+    assert json.loads(json.dumps({
+        game_id: game.to_dict() for game_id, game in games.items()
+    })) == data
@@ -0,0 +1,58 @@
+import pytest
+
+from goldfaish.features import extract_features
+from goldfaish.plot_stats import paired_win_rate
+
+PLAYERS = ["Ai(1)-A", "Ai(2)-B"]
+
+
+def make_data(games):
+    '''
+        `games` is a list of (winner index, pair id, swapped); only what
+        `paired_win_rate` reads is filled in.
+    '''
+    data = {}
+    for k, (winner, pair_id, swapped) in enumerate(games):
+        data[str(k)] = {
+            "turns": {},
+            "players": PLAYERS,
+            "winner": PLAYERS[winner],
+            "pair": None if pair_id is None else {
+                "id": pair_id,
+                "swapped": swapped
+            },
+        }
+    return data
+
+
+def test_paired_win_rate_matches_hand_computed_example():
+    table = extract_features(
+        make_data([
+            # Player 0's wins per pair: (1, 1), (1, 0), (0, 1), (0, 0).
+            (0, "p0", False),
+            (0, "p0", True),
+            (0, "p1", False),
+            (1, "p1", True),
+            (1, "p2", False),
+            (0, "p2", True),
+            (1, "p3", False),
+            (1, "p3", True),
+            # Ignored: a pair missing its swapped game, and an unpaired game.
+            (0, "p4", False),
+            (0, None, False),
+        ]))
+    rate, h, h_independent, num_pairs = paired_win_rate(table, 0)
+
+    # Pair means 1, .5, .5, 0: mean .5, sample std sqrt(1/6).
+    assert num_pairs == 4
+    assert rate == pytest.approx(0.5)
+    assert h == pytest.approx(1.959964 * (1 / 6)**0.5 / 2, rel=1e-6)
+    # Eight independent games: sqrt(.5 * .5 / 8).
+    assert h_independent == pytest.approx(1.959964 * (0.25 / 8)**0.5,
+                                           rel=1e-6)
+
+
+def test_paired_win_rate_needs_two_pairs():
+    table = extract_features(
+        make_data([(0, "p0", False), (1, "p0", True), (0, None, False)]))
+    assert paired_win_rate(table, 0) is None
@@ -0,0 +1,100 @@
+import glob
+import io
+import json
+import os
+
+from goldfaish.process_logs import (get_pair_info, pair_job_name,
+                                    parse_game_log_file, prune_game_log_file,
+                                    write_data_json)
+
+
+def parse(log_path):
+    with open(log_path, "r") as f:
+        return parse_game_log_file(f).to_dict()
+
+
+def test_pruned_logs_parse_like_raw_logs(fake_forge_job):
+    job_dir = fake_forge_job("job_0", 5)
+    log_paths = sorted(glob.glob(os.path.join(job_dir, "*.log")))
+    assert len(log_paths) == 5
+    for log_path in log_paths:
+        raw = parse(log_path)
+        before, after = prune_game_log_file(log_path)
+        assert after < before
+        assert parse(log_path) == raw
+
+
+def test_pruning_is_idempotent(fake_forge_job):
+    job_dir = fake_forge_job("job_0", 3)
+    for log_path in glob.glob(os.path.join(job_dir, "*.log")):
+        prune_game_log_file(log_path)
+        with open(log_path, "r") as f:
+            pruned = f.read()
+        before, after = prune_game_log_file(log_path)
+        assert before == after
+        with open(log_path, "r") as f:
+            assert f.read() == pruned
+        assert parse_game_log_file(io.StringIO(pruned)).winner != "NONE"
+
+
+def test_write_data_json_matches_json_dump(fake_forge_job):
+    job_dir = fake_forge_job("job_0", 4)
+    games = {}
+    for k, log_path in enumerate(sorted(glob.glob(os.path.join(job_dir,
+                                                               "*.log")))):
+        with open(log_path, "r") as f:
+            games[f"game_{k:03d}"] = parse_game_log_file(f)
+    expected = json.dumps(
+        {game_id: game.to_dict() for game_id, game in games.items()},
+        indent=2)
+
+    out = io.StringIO()
+    write_data_json(games, out)
+    assert out.getvalue() == expected
+
+    out = io.StringIO()
+    write_data_json({}, out)
+    assert out.getvalue() == json.dumps({}, indent=2)
+
+
+def test_get_pair_info():
+    assert get_pair_info(
+        os.path.join("logs", "20260101_pair_3", "A_vs_B_game_7.log")) == {
+            "id": "20260101_pair_3/7",
+            "swapped": False
+        }
+    assert get_pair_info(
+        os.path.join("logs", "20260101_pair_3_swapped",
+                     "B_vs_A_game_7.log")) == {
+                         "id": "20260101_pair_3/7",
+                         "swapped": True
+                     }
+    assert get_pair_info(
+        os.path.join("logs", "20260101_job_0", "A_vs_B_game_7.log")) is None
+
+
+def test_swapped_games_are_renamed_to_the_unswapped_seats(fake_forge_job):
+    # The first seat always wins, so the swapped game is won by deck B.
+    games = []
+    for swapped in (False, True):
+        job_dir = fake_forge_job(pair_job_name("20260101", 0, swapped),
+                                 1,
+                                 "--first-player-win-rate",
+                                 "1",
+                                 swapped=swapped)
+        (log_path,) = glob.glob(os.path.join(job_dir, "*.log"))
+        with open(log_path, "r") as f:
+            games.append(
+                parse_game_log_file(f, pair=get_pair_info(log_path)))
+    unswapped, swapped = games
+
+    players = ["Ai(1)-LoadTestRamp", "Ai(2)-LoadTestAggro"]
+    assert unswapped.players == players
+    assert swapped.players == players
+    assert unswapped.winner == "Ai(1)-LoadTestRamp"
+    assert swapped.winner == "Ai(2)-LoadTestAggro"
+    assert unswapped.pair == {"id": "20260101_pair_0/0", "swapped": False}
+    assert swapped.pair == {"id": "20260101_pair_0/0", "swapped": True}
+    # Deck B moves first in the swapped game.
+    assert swapped["turns"][1]["MAIN1"]["activeplayer"] == players[1]
+    assert set(swapped["turns"][1]["MAIN1"].keys()) >= set(players)
@@ -0,0 +1,22 @@
+import pytest
+
+from goldfaish.query import GameQuery, build_index
+
+PLAYERS = ["Ai(1)-A", "Ai(2)-B"]
+
+
+def test_summary_reports_length_in_the_filtered_unit():
+    # Games of 3, 7 and 8 Forge turns; only what the index reads is filled in.
+    data = {
+        str(k): {
+            "turns": {turn: {} for turn in range(1, num_turns + 1)},
+            "players": PLAYERS,
+            "winner": PLAYERS[0],
+        }
+        for k, num_turns in enumerate([3, 7, 8])
+    }
+    query = GameQuery(build_index(data)).num_turns(min_turns=7, max_turns=8)
+
+    summary = query.summary()
+    assert summary["matched"] == 2
+    assert summary["mean_turns"] == pytest.approx(7.5)
@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from goldfaish import rerun_all_experiments
+from goldfaish.rerun_all_experiments import collect_inputs, update_experiment
+from goldfaish.telemetry import TELEMETRY_NAME
+
+
+@pytest.fixture
+def collected_experiment(experiment_dir, fake_forge_job, monkeypatch):
+    '''
+        An experiment with one job of logs and telemetry, recorded as up to
+        date. Stages are replaced by a record of which ran; collect runs one
+        more fake Forge job and process and plot write placeholder outputs.
+    '''
+    stages = []
+    outputs = {
+        "goldfaish.process_logs": "data.json",
+        "goldfaish.plot_stats": "index.html"
+    }
+
+    def run_stage(module_name, argv):
+        stages.append(module_name)
+        if module_name == "goldfaish.collect_data":
+            fake_forge_job(f"job_{len(stages)}", 1)
+        else:
+            with open(os.path.join(experiment_dir, outputs[module_name]),
+                      "w") as f:
+                f.write("{}")
+
+    monkeypatch.setattr(rerun_all_experiments, "run_stage", run_stage)
+    fake_forge_job("job_0", 1)
+    with open(os.path.join(experiment_dir, TELEMETRY_NAME), "w") as f:
+        json.dump({"runs": []}, f)
+    update_experiment(experiment_dir, 1, 1)
+    stages.clear()
+    return experiment_dir, stages
+
+
+def edit_info(experiment_dir, edit):
+    info_path = os.path.join(experiment_dir, "info.json")
+    with open(info_path, "r") as f:
+        info = json.load(f)
+    edit(info)
+    with open(info_path, "w") as f:
+        json.dump(info, f, indent=1, sort_keys=True)
+        f.write("\n\n")
+
+
+def test_cosmetic_edits_keep_collect_inputs(experiment_dir):
+    before = collect_inputs(experiment_dir)
+    edit_info(experiment_dir, lambda info: info.update(notes="just a note"))
+    deck_path = os.path.join(experiment_dir, "decks", "LoadTestRamp.dck")
+    with open(deck_path, "r") as f:
+        lines = f.read().splitlines()
+    with open(deck_path, "w") as f:
+        f.write("\r\n".join(lines[:3] + lines[3:][::-1]) + "\r\n\n")
+    assert collect_inputs(experiment_dir) == before
+
+
+def test_changed_settings_only_warn(collected_experiment, capsys):
+    experiment_dir, stages = collected_experiment
+    edit_info(experiment_dir, lambda info: info.update(format="commander"))
+
+    assert update_experiment(experiment_dir, 1, 1) == []
+    assert stages == []
+    assert "format changed" in capsys.readouterr().out
+    assert os.path.isdir(os.path.join(experiment_dir, "logs", "job_0"))
+
+
+def test_recollect_moves_old_logs_and_telemetry(collected_experiment):
+    experiment_dir, stages = collected_experiment
+    edit_info(experiment_dir, lambda info: info.update(format="commander"))
+
+    assert update_experiment(experiment_dir, 1, 1, recollect_data=True) == [
+        "collect", "process", "plot"
+    ]
+    (stale_dir,) = [
+        name for name in os.listdir(experiment_dir)
+        if name.startswith("logs_stale_")
+    ]
+    stale_dir = os.path.join(experiment_dir, stale_dir)
+    assert os.listdir(os.path.join(experiment_dir, "logs")) == ["job_1"]
+    assert os.path.isdir(os.path.join(stale_dir, "job_0"))
+    assert os.path.exists(os.path.join(stale_dir, TELEMETRY_NAME))
+    assert not os.path.exists(os.path.join(experiment_dir, TELEMETRY_NAME))
+    # Now up to date.
+    assert update_experiment(experiment_dir, 1, 1) == []
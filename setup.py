@@ -14,6 +14,7 @@ setup(
     entry_points={
         'console_scripts': [
             'run-matchup=goldfaish.run_matchup:main',
+            'goldfaish=goldfaish.cli:main',
         ],
     },
 )